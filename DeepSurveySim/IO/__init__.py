@@ -1,2 +1,23 @@
-from DeepSurveySim.IO.read_config import ReadConfig
-from DeepSurveySim.IO.save_simulation import SaveSimulation
+"""
+Classes are imported from their modules the first time they are used (PEP 562),
+so reading a configuration does not load pandas.
+"""
+import importlib
+
+_exports = {
+    "ReadConfig": "DeepSurveySim.IO.read_config",
+    "SaveSimulation": "DeepSurveySim.IO.save_simulation",
+}
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -10,10 +10,11 @@ import datetime as dt
 class SaveSimulation:
     """
     Save a run survey to a json (survey results) and the config file used to generate it (yaml)
+    Variables that are the same for every site (ObservationVariables.site_invariant_variables) are saved once per timestep.
 
     Args:
         survey_instance (Survey.Survey): Survey used to generate the simulation
-        survey_results (dict): Run survey results - format of <mjd>:{variable:[value]}
+        survey_results (Union[Survey.SurveyResults, dict]): Run survey results, as returned by Survey.Survey.__call__, or a dict of the form <mjd>:{variable:[value]}
 
 
     Examples:
@@ -26,6 +27,8 @@ class SaveSimulation:
     def __init__(self, survey_instance, survey_results) -> None:
         assert survey_instance.save_config is not None
         self.survey_instance = survey_instance
+        if hasattr(survey_results, "to_dict"):
+            survey_results = survey_results.to_dict()
         self.survey_results = survey_results
 
         save_id = SaveSimulation._generate_run_id()
@@ -39,13 +42,16 @@ class SaveSimulation:
         """
         result_path = f"{self.save_path}/survey_results.json"
 
+        site_invariant = self.survey_instance.observator.site_invariant_variables
+
+        def format_variable(key, value):
+            if key in site_invariant:
+                value = value[0]
+            return np.ravel(value).tolist()
+
         format_result = {
             index: {
-                key: self.survey_results[index][key]
-                .reshape(
-                    self.survey_results[index][key].size,
-                )
-                .tolist()
+                key: format_variable(key, self.survey_results[index][key])
                 for key in self.survey_results[index].keys()
             }
             for index in self.survey_results.keys()
@@ -1,6 +1,35 @@
-from DeepSurveySim.Survey.survey import Survey
-from DeepSurveySim.Survey.observation_variables import (
-    ObservationVariables,
-)
-from DeepSurveySim.Survey.cummulative_survey import UniformSurvey, LowVisiblitySurvey
-from DeepSurveySim.Survey.weather import Weather
+"""
+Classes are imported from their modules the first time they are used (PEP 562),
+so importing the package does not load astropy, astroplan or pandas until they are needed.
+"""
+import importlib
+
+_exports = {
+    "Survey": "DeepSurveySim.Survey.survey",
+    "VectorSurvey": "DeepSurveySim.Survey.vector_survey",
+    "SurveyRollouts": "DeepSurveySim.Survey.rollout",
+    "SurveyResults": "DeepSurveySim.Survey.results",
+    "GreedyScheduler": "DeepSurveySim.Survey.scheduler",
+    "ObservationVariables": "DeepSurveySim.Survey.observation_variables",
+    "UniformSurvey": "DeepSurveySim.Survey.cummulative_survey",
+    "LowVisiblitySurvey": "DeepSurveySim.Survey.cummulative_survey",
+    "Weather": "DeepSurveySim.Survey.weather",
+    "EphemerisTable": "DeepSurveySim.Survey.ephemeris",
+    "AnalyticEphemeris": "DeepSurveySim.Survey.ephemeris",
+    "AltAzRotation": "DeepSurveySim.Survey.coordinates",
+    "SkyTessellation": "DeepSurveySim.Survey.tessellation",
+    "SkyBrightnessTable": "DeepSurveySim.Survey.sky_brightness",
+}
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,201 @@
+import numpy as np
+import astropy.constants
+import astropy.coordinates
+import astropy.units
+
+
+class AltAzRotation:
+    """
+    Convert sky positions to topocentric altitude/azimuth with one rotation matrix per observation time.
+
+    The GCRS -> AltAz rotation (precession, nutation, earth rotation, polar motion and latitude) is taken from astropy/ERFA
+    by transforming the three GCRS axes once per time. Refraction is not included (the same as astropy without a pressure set).
+    ICRS positions (the pointing sites) are first corrected for annual aberration with the earth's barycentric velocity,
+    and geocentric GCRS positions with a distance (the sun and moon) are corrected for parallax with the observatory position.
+    Every site and body at the same time shares the matrix, so converting all sites is a single matrix product.
+
+    The result agrees with SkyCoord.transform_to(AltAz) to better than 1 arcsecond.
+    The differences come from gravitational light deflection by the sun, which is ignored (under 0.01 arcseconds more than 45 degrees from the sun)
+    and second order aberration terms.
+
+    Args:
+        site (astropy.coordinates.EarthLocation): Location of the observatory
+        time (astropy.time.Time): Observation times, any shape
+
+    Examples:
+        >>> rotation = AltAzRotation(site, astropy.time.Time([60000.1, 60000.2], format="mjd"))
+            alt, az = rotation.sites(site_unit_vectors)  # (n sites, 2)
+            sun_alt, sun_az = rotation.bodies(astropy.coordinates.get_sun(rotation.time))  # (2,)
+    """
+
+    def __init__(self, site, time) -> None:
+        self.site = site
+        self.time = time
+
+        shape = (3,) + (1,) * time.ndim
+        axes = astropy.coordinates.UnitSphericalRepresentation(
+            lon=np.broadcast_to(np.reshape([0, 90, 0], shape), (3,) + time.shape)
+            * astropy.units.deg,
+            lat=np.broadcast_to(np.reshape([0, 0, 90], shape), (3,) + time.shape)
+            * astropy.units.deg,
+        )
+        axes_altaz = astropy.coordinates.GCRS(axes, obstime=time).transform_to(
+            astropy.coordinates.AltAz(obstime=time, location=site)
+        )
+        # matrix[..., :, i] is the (north, east, up) vector of GCRS axis i
+        self.matrix = np.moveaxis(
+            AltAzRotation.unit_vectors(
+                axes_altaz.az.radian, axes_altaz.alt.radian, axis=-1
+            ),
+            0,
+            -1,
+        )
+
+        _, earth_velocity = astropy.coordinates.get_body_barycentric_posvel(
+            "earth", time
+        )
+        aberration = np.moveaxis(
+            (earth_velocity.xyz / astropy.constants.c).to_value(
+                astropy.units.dimensionless_unscaled
+            ),
+            0,
+            -1,
+        )
+        self.rotated_aberration = np.einsum("...ij,...j->...i", self.matrix, aberration)
+
+        observer, _ = site.get_gcrs_posvel(time)
+        self.observer = np.moveaxis(observer.xyz.to_value(astropy.units.km), 0, -1)
+
+    @staticmethod
+    def unit_vectors(lon, lat, axis=0):
+        """
+        Cartesian unit vectors of spherical coordinates (in radians)
+
+        Args:
+            lon (array): Longitude (RA or azimuth)
+            lat (array): Latitude (declination or altitude)
+            axis (int, optional): Axis the three components are stacked on. Defaults to 0.
+
+        Returns:
+            array: x, y, z components
+        """
+        return np.stack(
+            [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)],
+            axis=axis,
+        )
+
+    @staticmethod
+    def seperation(vectors, other):
+        """
+        Angle between unit vectors, from atan2 of their cross and dot products.
+        Unlike arccos of the dot product, this keeps its precision for nearby vectors, and is exactly zero for equal ones.
+
+        Args:
+            vectors (array): Unit vectors, components on the last axis
+            other (array): Unit vectors that broadcast against vectors
+
+        Returns:
+            array: Angle in degrees, shape of the broadcast vectors without the component axis
+        """
+        return np.degrees(
+            np.arctan2(
+                np.linalg.norm(np.cross(vectors, other), axis=-1),
+                np.sum(vectors * other, axis=-1),
+            )
+        )
+
+    @staticmethod
+    def _horizontal(vectors, axis):
+        north, east, up = np.moveaxis(vectors, axis, 0)
+        norm = np.sqrt(north**2 + east**2 + up**2)
+        alt = np.degrees(np.arcsin(up / norm))
+        az = np.degrees(np.arctan2(east, north)) % 360
+        return alt, az
+
+    def sites(self, vectors, paired=False):
+        """
+        Altitude and azimuth of fixed ICRS positions
+
+        Args:
+            vectors (array): ICRS unit vectors, shape (n sites, 3)
+            paired (bool, optional): Rotate site i with the matrix of time i only (times of shape (n sites,)), instead of every site at every time. Defaults to False.
+
+        Returns:
+            tuple[array]: alt, az in degrees, shape (n sites, *time shape), or (n sites,) if paired
+        """
+        if paired:
+            rotated = np.einsum("...ij,...j->...i", self.matrix, vectors)
+            return AltAzRotation._horizontal(rotated + self.rotated_aberration, axis=-1)
+
+        # matrix @ (p + v/c) == matrix @ p + matrix @ v/c, so all sites are rotated in one product
+        rotated = np.matmul(self.matrix, vectors.T)
+        rotated += self.rotated_aberration[..., np.newaxis]
+        alt, az = AltAzRotation._horizontal(rotated, axis=-2)
+        return np.moveaxis(alt, -1, 0), np.moveaxis(az, -1, 0)
+
+    def bodies(self, coordinates):
+        """
+        Altitude and azimuth of solar system bodies, as returned by astropy.coordinates.get_sun and get_moon
+
+        Args:
+            coordinates (astropy.coordinates.SkyCoord): GCRS coordinates with the same shape as the time, with or without distance
+
+        Returns:
+            tuple[array]: alt, az in degrees, shape of the time
+        """
+        if isinstance(
+            coordinates.data, astropy.coordinates.UnitSphericalRepresentation
+        ):
+            vectors = AltAzRotation.unit_vectors(
+                coordinates.ra.radian, coordinates.dec.radian, axis=-1
+            )
+        else:
+            vectors = np.moveaxis(
+                coordinates.cartesian.xyz.to_value(astropy.units.km), 0, -1
+            )
+            vectors = vectors - self.observer
+
+        rotated = np.einsum("...ij,...j->...i", self.matrix, vectors)
+        return AltAzRotation._horizontal(rotated, axis=-1)
+
+
+TT_UTC = 69.184
+
+
+def local_mean_sidereal_time(mjd, longitude, ut1_utc=0.0, tt_utc=TT_UTC):
+    """
+    Local mean sidereal time from the IAU 2006 GMST expression (earth rotation angle plus precession polynomial), in numpy.
+
+    By default UT1 is taken as UTC, and TT as UTC + 69.184 seconds (only used in the polynomial).
+    UTC is kept within 0.9 seconds of UT1, so the result is within 0.9 seconds of sidereal time (0.004 degrees) of astroplan's
+    Observer.local_sidereal_time(time, "mean"), which applies the IERS UT1-UTC correction.
+    Passing the offsets for each time (e.g. ObservationVariables.ut1_utc and tt_utc) removes that difference.
+
+    Args:
+        mjd (array): Times in Mean Julian Date (UTC), any shape
+        longitude (float): East longitude of the observatory, in degrees
+        ut1_utc (Union[float, array], optional): UT1 - UTC in seconds, broadcast against mjd. Defaults to 0.
+        tt_utc (Union[float, array], optional): TT - UTC in seconds, broadcast against mjd. Defaults to 69.184.
+
+    Returns:
+        array: Local mean sidereal time in degrees [0, 360), the shape of mjd
+    """
+    days = np.asarray(mjd, dtype=float) - 51544.5
+    ut1_days = np.asarray(ut1_utc, dtype=float) / 86400
+    # Fractional day added separately to keep precision for large day counts
+    earth_rotation = 360 * (
+        (days % 1.0)
+        + ut1_days
+        + 0.7790572732640
+        + 0.00273781191135448 * (days + ut1_days)
+    )
+    centuries = (days + np.asarray(tt_utc, dtype=float) / 86400) / 36525
+    precession = (
+        0.014506
+        + 4612.156534 * centuries
+        + 1.3915817 * centuries**2
+        - 0.00000044 * centuries**3
+        - 0.000029956 * centuries**4
+        - 0.0000000368 * centuries**5
+    ) / 3600
+    return (earth_rotation + precession + longitude) % 360
@@ -23,6 +23,20 @@ class CummulativeSurvey(Survey):
         self.all_steps = pd.DataFrame()
         return super().reset()
 
+    def _checkpoint_tail(self, path):
+        """Save the rows of all_steps added since the last checkpoint"""
+        self._checkpoint_chunk(
+            path,
+            "all_steps",
+            len(self.all_steps),
+            lambda file, start, end: self.all_steps.iloc[start:end].to_pickle(file),
+            "pkl",
+        )
+
+    def _resume_tail(self, path, files):
+        chunks = [pd.read_pickle(f"{path}/{file}") for file in files["all_steps"]]
+        self.all_steps = pd.concat(chunks) if chunks else pd.DataFrame()
+
     def cummulative_reward(self):
         """Reward that uses the 'all_steps' class parameter."""
         raise NotImplemented
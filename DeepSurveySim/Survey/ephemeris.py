@@ -0,0 +1,434 @@
+import os
+import tempfile
+
+import numpy as np
+import astropy.coordinates
+import astropy.time
+import astropy.units
+
+
+class EphemerisTable:
+    """
+    Sun and moon positions precomputed with astropy at a fixed cadence, saved as a .npy file and interpolated at runtime.
+    The table is opened memory mapped (read only), so every process pointing to the same file shares one copy.
+    If the file does not exist it is built the first time it is requested.
+
+    Each row of the table is one time, with the columns named in EphemerisTable.columns.
+    Positions are stored as geocentric (GCRS) unit vectors so interpolating does not wrap around RA=360.
+
+    Args:
+        path (str): Path to the .npy table. If "default", the table is stored in the package settings directory.
+        start_mjd (float, optional): First time in the table, in Mean Julian Date. Defaults to 55000.
+        end_mjd (float, optional): Last time in the table, in Mean Julian Date. Defaults to 70100.
+        cadence_days (float, optional): Spacing between rows, in days. Defaults to 1 hour.
+
+    Examples:
+        >>> table = EphemerisTable("default", start_mjd=60000, end_mjd=60030)
+            positions = table(np.array([60000.5, 60001.2]))
+            positions["moon_ra"], positions["moon_decl"]
+    """
+
+    columns = [
+        "mjd",
+        "sun_x",
+        "sun_y",
+        "sun_z",
+        "sun_distance",
+        "moon_x",
+        "moon_y",
+        "moon_z",
+        "moon_distance",
+        "moon_phase",
+        "moon_illumination",
+    ]
+
+    def __init__(
+        self,
+        path: str = "default",
+        start_mjd: float = 55000,
+        end_mjd: float = 70100,
+        cadence_days: float = 1 / 24,
+    ) -> None:
+        if path == "default":
+            path = (
+                f"{os.path.dirname(__file__).rstrip('/')}/../settings/"
+                f"ephemeris_{start_mjd}_{end_mjd}_{round(cadence_days * 1440)}min.npy"
+            )
+        self.path = path
+
+        if not os.path.exists(self.path):
+            EphemerisTable.build(self.path, start_mjd, end_mjd, cadence_days)
+
+        self.table = np.load(self.path, mmap_mode="r")
+        self.start_mjd = self.table[0, 0]
+        self.end_mjd = self.table[-1, 0]
+        self.cadence_days = self.table[1, 0] - self.table[0, 0]
+
+    @staticmethod
+    def build(
+        path: str, start_mjd: float, end_mjd: float, cadence_days: float, chunk=50000
+    ):
+        """
+        Compute the table with astropy and write it to path.
+        The file is written to a temporary name and moved into place, so workers building the same table at once do not read a partial file.
+
+        Args:
+            path (str): Where to save the table (.npy)
+            start_mjd (float): First time in the table, in Mean Julian Date
+            end_mjd (float): Last time in the table, in Mean Julian Date
+            cadence_days (float): Spacing between rows, in days
+            chunk (int, optional): Number of times computed at once. Defaults to 50000.
+        """
+        n_rows = int(np.ceil((end_mjd - start_mjd) / cadence_days)) + 1
+        mjd = start_mjd + cadence_days * np.arange(n_rows)
+
+        table = np.empty((n_rows, len(EphemerisTable.columns)))
+        table[:, 0] = mjd
+        for start in range(0, n_rows, chunk):
+            rows = slice(start, start + chunk)
+            time = astropy.time.Time(mjd[rows], format="mjd")
+
+            sun = astropy.coordinates.get_sun(time)
+            moon = astropy.coordinates.get_moon(time)
+            phase = moon_phase_angle(sun, moon)
+
+            table[rows, 1:4] = sun.cartesian.xyz.to_value(astropy.units.AU).T
+            table[rows, 4] = sun.distance.to_value(astropy.units.AU)
+            table[rows, 1:4] /= table[rows, 4:5]
+            table[rows, 5:8] = moon.cartesian.xyz.to_value(astropy.units.km).T
+            table[rows, 8] = moon.distance.to_value(astropy.units.km)
+            table[rows, 5:8] /= table[rows, 8:9]
+            table[rows, 9] = phase.to_value(astropy.units.deg)
+            table[rows, 10] = (1 + np.cos(phase)).to_value() / 2.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=directory, suffix=".npy", delete=False
+        ) as f:
+            np.save(f, table)
+        os.replace(f.name, path)
+
+    def __call__(self, mjd):
+        """
+        Interpolate the table to the requested times
+
+        Args:
+            mjd (array): Times in Mean Julian Date, any shape
+
+        Returns:
+            dict[array]: sun_ra, sun_decl (degrees), sun_distance (AU), moon_ra, moon_decl (degrees), moon_distance (km), moon_phase (degrees), moon_illumination; each the shape of mjd
+        """
+        mjd = np.asarray(mjd, dtype=float)
+        if np.any(mjd < self.start_mjd) or np.any(mjd > self.end_mjd):
+            raise ValueError(
+                f"Time outside of the ephemeris table ({self.start_mjd}, {self.end_mjd}), rebuild it with a wider span"
+            )
+
+        position = (mjd.ravel() - self.start_mjd) / self.cadence_days
+        index = np.minimum(position.astype(int), len(self.table) - 2)
+        weight = (position - index)[:, np.newaxis]
+        rows = (1 - weight) * self.table[index] + weight * self.table[index + 1]
+
+        ephemeris = {}
+        for body, columns in (("sun", slice(1, 4)), ("moon", slice(5, 8))):
+            x, y, z = rows[:, columns].T / np.linalg.norm(rows[:, columns], axis=1)
+            ephemeris[f"{body}_ra"] = np.degrees(np.arctan2(y, x)) % 360
+            ephemeris[f"{body}_decl"] = np.degrees(np.arcsin(z))
+        ephemeris["sun_distance"] = rows[:, 4]
+        ephemeris["moon_distance"] = rows[:, 8]
+        ephemeris["moon_phase"] = rows[:, 9]
+        ephemeris["moon_illumination"] = rows[:, 10]
+
+        return {key: value.reshape(mjd.shape) for key, value in ephemeris.items()}
+
+
+def moon_phase_angle(sun, moon):
+    """
+    Angle between the sun and earth as seen from the moon, as in astroplan.moon.moon_phase_angle but using already computed coordinates
+
+    Args:
+        sun (astropy.coordinates.SkyCoord): Sun position, with distance
+        moon (astropy.coordinates.SkyCoord): Moon position, with distance
+
+    Returns:
+        astropy.units.Quantity: Phase angle
+    """
+    elongation = sun.separation(moon)
+    return np.arctan2(
+        sun.distance * np.sin(elongation),
+        moon.distance - sun.distance * np.cos(elongation),
+    )
+
+
+class AnalyticEphemeris:
+    """
+    Low precision sun and moon positions from closed form series, evaluated with numpy over arrays of times.
+    Uses the low accuracy solar theory of Meeus (Astronomical Algorithms, 2nd ed., ch. 25)
+    and the largest terms of the lunar theory of Meeus (ch. 47, tables 47.A and 47.B).
+
+    Positions are returned in the same (GCRS, J2000 axes) frame as astropy.coordinates.get_sun/get_moon,
+    and agree with them to about 1 arcminute between 1990 and 2050.
+    UTC is converted to TT with a fixed offset (TT_UTC_SECONDS), which adds at most a few arcseconds of error to the moon.
+
+    Examples:
+        >>> ephemeris = AnalyticEphemeris()
+            positions = ephemeris(np.array([60000.5, 60001.2]))
+            positions["moon_ra"], positions["moon_decl"]
+    """
+
+    TT_UTC_SECONDS = 69.184
+    AU_KM = 149597870.7
+    J2000_OBLIQUITY = 23.4392911
+
+    # D, M, M', F, longitude (1e-6 degrees), distance (1e-3 km)
+    moon_longitude_distance_terms = np.array(
+        [
+            [0, 0, 1, 0, 6288774, -20905355],
+            [2, 0, -1, 0, 1274027, -3699111],
+            [2, 0, 0, 0, 658314, -2955968],
+            [0, 0, 2, 0, 213618, -569925],
+            [0, 1, 0, 0, -185116, 48888],
+            [0, 0, 0, 2, -114332, -3149],
+            [2, 0, -2, 0, 58793, 246158],
+            [2, -1, -1, 0, 57066, -152138],
+            [2, 0, 1, 0, 53322, -170733],
+            [2, -1, 0, 0, 45758, -204586],
+            [0, 1, -1, 0, -40923, -129620],
+            [1, 0, 0, 0, -34720, 108743],
+            [0, 1, 1, 0, -30383, 104755],
+            [2, 0, 0, -2, 15327, 10321],
+            [0, 0, 1, 2, -12528, 0],
+            [0, 0, 1, -2, 10980, 79661],
+            [4, 0, -1, 0, 10675, -34782],
+            [0, 0, 3, 0, 10034, -23210],
+            [4, 0, -2, 0, 8548, -21636],
+            [2, 1, -1, 0, -7888, 24208],
+            [2, 1, 0, 0, -6766, 30824],
+            [1, 0, -1, 0, -5163, -8379],
+            [1, 1, 0, 0, 4987, -16675],
+            [2, -1, 1, 0, 4036, -12831],
+            [2, 0, 2, 0, 3994, -10445],
+            [4, 0, 0, 0, 3861, -11650],
+            [2, 0, -3, 0, 3665, 14403],
+            [0, 1, -2, 0, -2689, -7003],
+            [2, 0, -1, 2, -2602, 0],
+            [2, -1, -2, 0, 2390, 10056],
+            [1, 0, 1, 0, -2348, 6322],
+            [2, -2, 0, 0, 2236, -9884],
+        ]
+    )
+
+    # D, M, M', F, latitude (1e-6 degrees)
+    moon_latitude_terms = np.array(
+        [
+            [0, 0, 0, 1, 5128122],
+            [0, 0, 1, 1, 280602],
+            [0, 0, 1, -1, 277693],
+            [2, 0, 0, -1, 173237],
+            [2, 0, -1, 1, 55413],
+            [2, 0, -1, -1, 46271],
+            [2, 0, 0, 1, 32573],
+            [0, 0, 2, 1, 17198],
+            [2, 0, 1, -1, 9266],
+            [0, 0, 2, -1, 8822],
+            [2, -1, 0, -1, 8216],
+            [2, 0, -2, -1, 4324],
+            [2, 0, 1, 1, 4200],
+            [2, 1, 0, -1, -3359],
+            [2, -1, -1, 1, 2463],
+            [2, -1, 0, 1, 2211],
+            [2, -1, -1, -1, 2065],
+            [0, 1, -1, -1, -1870],
+            [4, 0, -1, -1, 1828],
+            [0, 1, 0, 1, -1794],
+            [0, 0, 0, 3, -1749],
+            [0, 1, -1, 1, -1565],
+            [1, 0, 0, 1, -1491],
+            [0, 1, 1, 1, -1475],
+            [0, 1, 1, -1, -1410],
+            [0, 1, 0, -1, -1344],
+            [1, 0, 0, -1, -1335],
+            [0, 0, 3, 1, 1107],
+            [4, 0, 0, -1, 1021],
+            [4, 0, -1, 1, 833],
+        ]
+    )
+
+    def _centuries(self, mjd):
+        return (mjd + self.TT_UTC_SECONDS / 86400.0 - 51544.5) / 36525.0
+
+    def _precession(self, centuries):
+        # General precession in longitude, moving ecliptic longitudes of date to J2000
+        return (5029.0966 * centuries + 1.11113 * centuries**2) / 3600.0
+
+    def _equatorial(self, longitude, latitude):
+        longitude, latitude = np.radians(longitude), np.radians(latitude)
+        obliquity = np.radians(self.J2000_OBLIQUITY)
+
+        x = np.cos(latitude) * np.cos(longitude)
+        y = np.cos(latitude) * np.sin(longitude)
+        z = np.sin(latitude)
+
+        y, z = (
+            y * np.cos(obliquity) - z * np.sin(obliquity),
+            y * np.sin(obliquity) + z * np.cos(obliquity),
+        )
+        return np.stack([x, y, z])
+
+    def sun(self, mjd):
+        """
+        Geocentric apparent position of the sun
+
+        Args:
+            mjd (array): Times in Mean Julian Date
+
+        Returns:
+            tuple: unit vector (3, *mjd.shape) in J2000 equatorial axes, distance in AU
+        """
+        t = self._centuries(mjd)
+        mean_longitude = 280.46646 + 36000.76983 * t + 0.0003032 * t**2
+        mean_anomaly = np.radians(357.52911 + 35999.05029 * t - 0.0001537 * t**2)
+        eccentricity = 0.016708634 - 0.000042037 * t - 0.0000001267 * t**2
+
+        center = (
+            (1.914602 - 0.004817 * t - 0.000014 * t**2) * np.sin(mean_anomaly)
+            + (0.019993 - 0.000101 * t) * np.sin(2 * mean_anomaly)
+            + 0.000289 * np.sin(3 * mean_anomaly)
+        )
+        true_anomaly = mean_anomaly + np.radians(center)
+        distance = (
+            1.000001018
+            * (1 - eccentricity**2)
+            / (1 + eccentricity * np.cos(true_anomaly))
+        )
+
+        # Annual aberration, to match the apparent (GCRS) direction
+        aberration = -20.4898 / 3600.0 / distance
+        longitude = mean_longitude + center + aberration - self._precession(t)
+
+        return self._equatorial(longitude, np.zeros_like(longitude)), distance
+
+    def moon(self, mjd):
+        """
+        Geocentric position of the moon
+
+        Args:
+            mjd (array): Times in Mean Julian Date
+
+        Returns:
+            tuple: unit vector (3, *mjd.shape) in J2000 equatorial axes, distance in km
+        """
+        t = self._centuries(mjd)
+
+        mean_longitude = (
+            218.3164477
+            + 481267.88123421 * t
+            - 0.0015786 * t**2
+            + t**3 / 538841
+            - t**4 / 65194000
+        )
+        elongation = (
+            297.8501921
+            + 445267.1114034 * t
+            - 0.0018819 * t**2
+            + t**3 / 545868
+            - t**4 / 113065000
+        )
+        sun_anomaly = 357.5291092 + 35999.0502909 * t - 0.0001536 * t**2
+        moon_anomaly = (
+            134.9633964
+            + 477198.8675055 * t
+            + 0.0087414 * t**2
+            + t**3 / 69699
+            - t**4 / 14712000
+        )
+        latitude_argument = (
+            93.2720950
+            + 483202.0175233 * t
+            - 0.0036539 * t**2
+            - t**3 / 3526000
+            + t**4 / 863310000
+        )
+        a1 = np.radians(119.75 + 131.849 * t)
+        a2 = np.radians(53.09 + 479264.290 * t)
+        a3 = np.radians(313.45 + 481266.484 * t)
+        eccentricity = 1 - 0.002516 * t - 0.0000074 * t**2
+
+        arguments = np.radians(
+            np.stack([elongation, sun_anomaly, moon_anomaly, latitude_argument])
+        )
+
+        def series(terms):
+            angle = np.tensordot(terms[:, :4], arguments, axes=1)
+            # Terms depending on the sun's anomaly are scaled by the earth orbit eccentricity
+            correction = eccentricity ** np.abs(terms[:, 1]).reshape(
+                (-1,) + (1,) * eccentricity.ndim
+            )
+            return angle, correction
+
+        terms = self.moon_longitude_distance_terms
+        angle, correction = series(terms)
+        longitude_sum = np.tensordot(terms[:, 4], correction * np.sin(angle), axes=1)
+        distance_sum = np.tensordot(terms[:, 5], correction * np.cos(angle), axes=1)
+
+        terms = self.moon_latitude_terms
+        angle, correction = series(terms)
+        latitude_sum = np.tensordot(terms[:, 4], correction * np.sin(angle), axes=1)
+
+        mean_longitude_radians = np.radians(mean_longitude)
+        latitude_radians = np.radians(latitude_argument)
+        moon_anomaly_radians = np.radians(moon_anomaly)
+        longitude_sum = (
+            longitude_sum
+            + 3958 * np.sin(a1)
+            + 1962 * np.sin(mean_longitude_radians - latitude_radians)
+            + 318 * np.sin(a2)
+        )
+        latitude_sum = (
+            latitude_sum
+            - 2235 * np.sin(mean_longitude_radians)
+            + 382 * np.sin(a3)
+            + 175 * np.sin(a1 - latitude_radians)
+            + 175 * np.sin(a1 + latitude_radians)
+            + 127 * np.sin(mean_longitude_radians - moon_anomaly_radians)
+            - 115 * np.sin(mean_longitude_radians + moon_anomaly_radians)
+        )
+
+        longitude = mean_longitude + longitude_sum / 1e6 - self._precession(t)
+        latitude = latitude_sum / 1e6
+        distance = 385000.56 + distance_sum / 1000.0
+
+        return self._equatorial(longitude, latitude), distance
+
+    def __call__(self, mjd):
+        """
+        Evaluate the sun and moon positions at the requested times
+
+        Args:
+            mjd (array): Times in Mean Julian Date, any shape
+
+        Returns:
+            dict[array]: sun_ra, sun_decl (degrees), sun_distance (AU), moon_ra, moon_decl (degrees), moon_distance (km), moon_phase (degrees), moon_illumination; each the shape of mjd
+        """
+        mjd = np.asarray(mjd, dtype=float)
+        sun, sun_distance = self.sun(mjd)
+        moon, moon_distance = self.moon(mjd)
+
+        ephemeris = {}
+        for body, (x, y, z) in (("sun", sun), ("moon", moon)):
+            ephemeris[f"{body}_ra"] = np.degrees(np.arctan2(y, x)) % 360
+            ephemeris[f"{body}_decl"] = np.degrees(np.arcsin(z))
+
+        elongation = np.arccos(np.clip(np.sum(sun * moon, axis=0), -1, 1))
+        sun_distance_km = sun_distance * self.AU_KM
+        phase = np.arctan2(
+            sun_distance_km * np.sin(elongation),
+            moon_distance - sun_distance_km * np.cos(elongation),
+        )
+
+        ephemeris["sun_distance"] = sun_distance
+        ephemeris["moon_distance"] = moon_distance
+        ephemeris["moon_phase"] = np.degrees(phase)
+        ephemeris["moon_illumination"] = (1 + np.cos(phase)) / 2.0
+        return ephemeris
@@ -0,0 +1,33 @@
+from astropy.utils import iers
+
+
+def configure_iers(mode: str = "download"):
+    """
+    Choose where astropy gets earth orientation (UT1-UTC, polar motion) and leap second tables from.
+    This is global astropy state, so it applies to every ObservationVariables in the process.
+
+    "download" keeps the astropy defaults, which fetch IERS-A tables from the internet when they are first needed.
+    "offline" never downloads. It uses the IERS-A and leap second snapshot from the astropy-iers-data package if it is installed,
+    and otherwise the IERS-B table and leap seconds bundled with astropy.
+    Times past the end of the snapshot warn (with reduced accuracy) instead of failing.
+
+    Args:
+        mode (str, optional): "download" or "offline". Defaults to "download".
+    """
+    assert mode in ["download", "offline"], "iers must be 'download' or 'offline'"
+    if mode == "download":
+        return
+
+    iers.conf.auto_download = False
+    iers.conf.iers_degraded_accuracy = "warn"
+
+    try:
+        import astropy_iers_data
+
+    except ModuleNotFoundError:
+        return
+
+    iers.earth_orientation_table.set(iers.IERS_A.open(astropy_iers_data.IERS_A_FILE))
+    iers.LeapSeconds.open(
+        astropy_iers_data.IERS_LEAP_SECOND_FILE
+    ).update_erfa_leap_seconds()
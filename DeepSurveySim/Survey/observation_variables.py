@@ -1,10 +1,18 @@
 from typing import Union
-import astroplan
-import astropy
+import astropy.coordinates
+import astropy.time
+import astropy.units
+import astropy.utils.iers
 import numpy as np
+import contextlib
 import os
+import warnings
+import erfa
 import numexpr
 
+from DeepSurveySim.Survey.coordinates import AltAzRotation, local_mean_sidereal_time
+from DeepSurveySim.Survey.iers import configure_iers
+
 
 class ObservationVariables:
     """
@@ -16,7 +24,9 @@ class ObservationVariables:
         calculating the requested variables
         Possible calculations are seen with ObservationVariables.variables
 
-    All variables are returned with the dimensions (n observation times, n sites) in a dictionary labeled with their variable names
+    All variables are returned with the dimensions (n sites, n observation times) in a dictionary labeled with their variable names.
+    Updating with an array of times evaluates every variable for all of those times at once (see ObservationVariables.batch)
+    Updating with paired=True instead gives each site its own time (n sites == n observation times), and variables are only evaluated for those pairs, shape (n sites,)
 
     Args:
         observator_configuration (dict): Describes the way the observatory is set up. This contains:
@@ -38,13 +48,45 @@ class ObservationVariables:
         optics_fwhm (float): Default 0.45
         location (dict) :
             dictionary containing either 'n_sites'
-                (Number of sequentically generated sites spanning the whole sky)
+                (Number of sequentically generated sites spanning the whole sky),
+            'nside' (Equal area grid of 12 * nside^2 sites covering the whole sky, see Survey.SkyTessellation),
             or paired "ra" and "decl", containing lists of locations.
             Default: 10 sites.
         use_skybright (bool):
             use the skybright program to add additional variables to the program
             Requires an outside download of PalPy (Not included with this distirbution)
             Default: False
+        sky_brightness (str):
+            "skybright" to evaluate the skybright model, or "table" to interpolate a grid built from it once (see Survey.SkyBrightnessTable)
+            Default: "skybright"
+        sky_brightness_table (dict):
+            Arguments for Survey.SkyBrightnessTable ("path", "n_samples", "bins"). Only used if sky_brightness is "table".
+        ephemeris (str):
+            Where sun and moon positions come from.
+            "astropy" computes them at every new time, "table" interpolates a table precomputed over "ephemeris_table",
+            "fast" uses low precision (~1 arcminute) analytic series evaluated with numpy
+            Default: "astropy"
+        ephemeris_table (dict):
+            Arguments for Survey.EphemerisTable ("path", "start_mjd", "end_mjd", "cadence_days").
+            Only used if ephemeris is "table".
+        sidereal_time (str):
+            "astroplan" uses Observer.local_sidereal_time (IERS UT1-UTC corrected),
+            "fast" uses the IAU 2006 expression in numpy (see Survey.coordinates.local_mean_sidereal_time), with the IERS UT1 - UTC if iers is "offline",
+            otherwise with UT1 = UTC (within 0.9 seconds of time), so changing iers moves the "fast" sidereal time by up to 0.9 seconds
+            Default: "astroplan"
+        iers (str):
+            "download" lets astropy fetch earth orientation tables when needed,
+            "offline" never downloads and uses the snapshot from astropy-iers-data (or the tables bundled with astropy), see Survey.iers.configure_iers
+            Default: "download"
+        dtype (str):
+            Floating point type variables are calculated in and returned as, "float64" or "float32".
+            float32 halves the memory of large batches; numexpr/numpy kernels (airmass, seeing, seperations) run in it directly
+            Default: "float64"
+        altaz_engine (str):
+            How positions are converted to altitude/azimuth.
+            "astropy" transforms each set of coordinates with SkyCoord.transform_to,
+            "rotation" applies one cached rotation matrix per time to all sites and bodies (within 1 arcsecond of astropy, see Survey.AltAzRotation)
+            Default: "astropy"
 
     Examples:
         >>> observer = ObservationVariables(configuration)
@@ -62,10 +104,60 @@ class ObservationVariables:
 
     """
 
+    # Each variable: (function that calculates it, variables that function is calculated from)
+    variable_registry = {
+        "sun_ra": ("calculate_sun_location", []),
+        "sun_decl": ("calculate_sun_location", []),
+        "sun_airmass": ("calculate_sun_airmass", []),
+        "sun_ha": ("calculate_sun_ha", []),
+        "ha": ("calculate_observation_ha", []),
+        "az": ("calculate_observation_angles", []),
+        "alt": ("calculate_observation_angles", []),
+        "airmass": ("calculate_observation_airmass", ["alt"]),
+        "moon_airmass": ("calculate_moon_airmass", []),
+        "moon_ra": ("calculate_moon_location", []),
+        "moon_decl": ("calculate_moon_location", []),
+        "moon_elongation": ("calculate_moon_brightness", []),
+        "moon_phase": ("calculate_moon_brightness", []),
+        "moon_illumination": ("calculate_moon_brightness", []),
+        "moon_Vmagintude": ("calculate_moon_brightness", []),
+        "moon_seperation": ("calculate_moon_brightness", []),
+        "moon_ha": ("calculate_moon_ha", []),
+        "sun_seperation": ("calculate_sun_seperation", []),
+        "pt_seeing": ("calculate_seeing", ["airmass"]),
+        "band_seeing": ("calculate_seeing", ["airmass"]),
+        "fwhm": ("calculate_seeing", ["airmass"]),
+        "lst": ("calculate_lst", []),
+        "sky_magnitude": ("calculate_sky_magnitude", ["moon_elongation"]),
+        "tau": ("calculate_sky_magnitude", ["fwhm", "sky_magnitude"]),
+        "teff": ("calculate_sky_magnitude", ["tau"]),
+    }
+    skybright_variables = ["sky_magnitude", "tau", "teff"]
+    # Variables that only depend on time. They are returned as read-only views repeating one value per time for every site
+    site_invariant_variables = [
+        "sun_ra",
+        "sun_decl",
+        "sun_airmass",
+        "sun_ha",
+        "moon_airmass",
+        "moon_ra",
+        "moon_decl",
+        "moon_elongation",
+        "moon_phase",
+        "moon_illumination",
+        "moon_Vmagintude",
+        "moon_ha",
+        "lst",
+    ]
+
     def __init__(self, observator_configuration: dict):
 
         if observator_configuration["use_skybright"]:
-            self._init_skybright(observator_configuration["skybright"])
+            self._init_skybright(
+                observator_configuration["skybright"],
+                observator_configuration["sky_brightness"],
+                observator_configuration["sky_brightness_table"],
+            )
 
         self.degree = astropy.units.deg
         self.radians = astropy.units.rad
@@ -73,11 +165,19 @@ class ObservationVariables:
 
         self.to_radians = self.degree.to(self.radians)
 
-        self.observator = self._init_observator(
+        self.iers = observator_configuration["iers"]
+        configure_iers(self.iers)
+
+        self._observatory_position = (
             observator_configuration["latitude"],
             observator_configuration["longitude"],
             observator_configuration["elevation"],
         )
+        self._observator = None
+        self.site = astropy.coordinates.EarthLocation.from_geodetic(
+            lon=observator_configuration["longitude"] * self.degree,
+            lat=observator_configuration["latitude"] * self.degree,
+        )
 
         self.band_wavelengths = observator_configuration["wavelengths"]
 
@@ -88,6 +188,14 @@ class ObservationVariables:
 
         self.optics_fwhm = observator_configuration["fwhm"]
 
+        self.ephemeris = self._init_ephemeris(
+            observator_configuration["ephemeris"],
+            observator_configuration["ephemeris_table"],
+        )
+
+        self.tessellation = self._init_tessellation(
+            **observator_configuration["location"]
+        )
         self.default_locations = self._default_locations(
             **observator_configuration["location"]
         )
@@ -96,15 +204,51 @@ class ObservationVariables:
         else:
             self.position_fuzz = {"ra": 0, "decl": 0}
 
-        self.time = None
+        self.sidereal_time = observator_configuration["sidereal_time"]
+        assert self.sidereal_time in [
+            "astroplan",
+            "fast",
+        ], "sidereal_time must be 'astroplan' or 'fast'"
+
+        self.dtype = np.dtype(observator_configuration["dtype"])
+        assert self.dtype in [
+            np.float32,
+            np.float64,
+        ], "dtype must be float32 or float64"
+
+        self.altaz_engine = observator_configuration["altaz_engine"]
+        assert self.altaz_engine in [
+            "astropy",
+            "rotation",
+        ], "altaz_engine must be 'astropy' or 'rotation'"
+
+        self.mjd = None
+        self.paired = False
+        self._ephemeris = {}
+        self._results = {}
         self.location = self.default_locations
+        self._site_vectors = None
         self.band = "g"
 
         self.slew_rate = observator_configuration["slew_expr"]
         self.band_change_rate = observator_configuration["filter_change_rate"]
         self.readout_seconds = observator_configuration["readout_seconds"]
+        self.min_moon_angle = observator_configuration["min_moon_angle"]
+        self._slew_matrix = None
+
+    def _init_skybright(self, skybright_config, backend, table_config):
+        assert backend in [
+            "skybright",
+            "table",
+        ], "sky_brightness must be 'skybright' or 'table'"
+        if backend == "table":
+            from DeepSurveySim.Survey import SkyBrightnessTable
+
+            self.skybright = SkyBrightnessTable(
+                skybright_config=skybright_config["config"], **table_config
+            )
+            return
 
-    def _init_skybright(self, skybright_config):
         from configparser import ConfigParser
 
         try:
@@ -129,6 +273,28 @@ class ObservationVariables:
 
         self.skybright = skybright.MoonSkyModel(skybright_config_file)
 
+    def _init_ephemeris(self, ephemeris, table_config):
+        ephemeris_options = ["astropy", "table", "fast"]
+        assert (
+            ephemeris in ephemeris_options
+        ), f"ephemeris must be one of {ephemeris_options}"
+        if ephemeris == "astropy":
+            return None
+
+        from DeepSurveySim.Survey import AnalyticEphemeris, EphemerisTable
+
+        if ephemeris == "table":
+            return EphemerisTable(**table_config)
+        return AnalyticEphemeris()
+
+    def _init_tessellation(self, nside=None, **location):
+        if nside is None:
+            return None
+
+        from DeepSurveySim.Survey import SkyTessellation
+
+        return SkyTessellation(nside)
+
     def _init_weather(self, weather_config):
         from DeepSurveySim.Survey import Weather
 
@@ -141,6 +307,8 @@ class ObservationVariables:
         time: Union[float, list[float]],
         location: Union[dict, None] = None,
         band: Union[str, None] = None,
+        delay: bool = True,
+        paired: bool = False,
     ):
         """
         Move the simulation forward to the next site.
@@ -150,8 +318,17 @@ class ObservationVariables:
             time (Union[float, list[float]]): Time to move forward to, in Mean Julian Date
             location (Union[dict, None], optional): Location (paired ra/delc) in degrees to move the telescope pointing. Will not change the pointing if location not specificed. Defaults to None.
             band (Union[str, None], optional): Optical filter to use for observation. Will not be changed if not specified. Select from bands specified by ObservationVariables.band_wavelengths. Defaults to None.
+            delay (bool, optional): Add the slew, filter change and readout time to the time, and offset the new location by position_fuzz. If False the time and location are used as given. Defaults to True.
+            paired (bool, optional): Observe each site at one time only, site i at time i, instead of every site at every time. Always used when the sites of a new location are reached at different times. Defaults to False.
         """
-        if location is not None:
+        if not delay:
+            if location is not None:
+                location = self._sky_coordinates(location["ra"], location["decl"])
+            else:
+                location = self.location
+            delay = 0
+
+        elif location is not None:
             assert "ra" in location.keys()
             assert "decl" in location.keys()
 
@@ -165,67 +342,182 @@ class ObservationVariables:
             else:
                 delay = 0
 
-        self.time = self._time(time + delay)
+        time = np.asarray(time, dtype=np.float64)
+        # Delays are in the configured dtype; the times stay float64 (a float32 mjd is only good to minutes)
+        mjd = time + np.asarray(delay, dtype=np.float64)
+        if mjd.shape != time.shape and mjd.size > 1:
+            if np.all(mjd == mjd.flat[0]):
+                # Every site is reached at once (e.g. staying on the same sites), so they share the time
+                mjd = np.full(time.shape, mjd.flat[0])
+            else:
+                # Each site is reached after its own slew, so it is only observed at its own time
+                paired = True
+        if (
+            (self.mjd is None)
+            or (mjd.shape != self.mjd.shape)
+            or np.any(mjd != self.mjd)
+        ):
+            self._ephemeris = {}
+        if paired and mjd.shape != (len(location),):
+            raise ValueError(
+                f"Cannot pair {len(location)} sites with times of shape {mjd.shape}"
+            )
+        self.mjd = mjd
+        self.paired = paired
+        self._results = {}
         self.band = band if band is not None else self.band
+        if location is not self.location:
+            self._site_vectors = None
         self.location = location
 
         if hasattr(self, "weather"):
-            conditions = self.weather.condition(self.time)
-            self.seeing = self.weather.seeing(conditions)
-            self.clouds = self.weather.clouds(conditions)
-
-    def _angular_distance(self, location):
-        ra1, ra2 = np.array(
-            (self.location.ra.value * np.pi / 180) + 10**-9
-        ), np.array((location.ra.value * np.pi / 180) + 10**-9)
-        decl1, decl2 = np.array(
-            (self.location.dec.value * np.pi / 180) + 10**-9
-        ), np.array((location.dec.value * np.pi / 180) + 10**-9)
-
-        seperation = np.arccos(
-            np.sin(decl1) * np.sin(decl2)
-            + np.cos(decl1) * np.cos(decl2) * np.cos(abs(ra1 - ra2))
-        )
-        seperation = np.where(seperation == np.nan, seperation, 0)
+            self.seeing, self.clouds = self.weather(self.mjd)
 
-        return seperation
+    @contextlib.contextmanager
+    def preserve(self):
+        """
+        Return to the current time, location and band (and keep the calculations already made for them) when the block ends.
+
+        Examples:
+            >>> with observatory.preserve():
+                    observatory.update(time=60000.5, location={"ra": [10], "decl": [-20]})
+                    airmass = observatory.calculate(["airmass"])
+        """
+        saved = {
+            name: getattr(self, name)
+            for name in [
+                "mjd",
+                "paired",
+                "location",
+                "band",
+                "seeing",
+                "clouds",
+                "_ephemeris",
+                "_results",
+                "_site_vectors",
+            ]
+        }
+        try:
+            yield self
+        finally:
+            for name, value in saved.items():
+                setattr(self, name, value)
+
+    def _angular_distance(self, location, paired=True):
+        """
+        Separation (degrees) between the current pointing and each site of a new location.
+        Sites are paired with the current sites if there are as many (or the current pointing is one site), otherwise measured from the centre of the current pointing.
+        With paired=False every site is measured as a move to that one site would be (from the centre, unless the current pointing is one site).
+        """
+        vectors = AltAzRotation.unit_vectors(
+            location.ra.radian, location.dec.radian, axis=-1
+        )
+        current = self._site_unit_vectors()
+        if len(current) != 1 and (not paired or len(current) != np.size(vectors) // 3):
+            current = np.sum(current, axis=0)
+            current = current / np.linalg.norm(current)
+        return AltAzRotation.seperation(current, vectors.astype(self.dtype))
 
     def _delay_time(self, location, band):
-        delay = self.slew_rate * self._angular_distance(location)
+        band_change = (band is not None) and (band != self.band)
+        return self._delay_days(self._angular_distance(location), band_change)
 
-        if band != self.band:
-            delay += self.band_change_rate
-        delay += self.readout_seconds
+    def _delay_days(self, seperation, band_change):
+        """Slew (for a seperation in degrees), filter change (where band_change is true) and readout time, in days"""
+        delay = self.slew_rate * seperation
+        delay = delay + np.where(band_change, self.band_change_rate, 0)
+        delay = delay + self.readout_seconds
+        return delay * 0.00001157407
 
-        delay_days = delay * 0.00001157407
-        return delay_days
+    def slew_delay_matrix(self):
+        """
+        Time (in seconds) to slew between every pair of default sites and read out the camera, computed once and cached.
+        Requires n sites^2 floats of memory. Each entry is the delay ObservationVariables.update applies for that move.
+
+        Returns:
+            array: Delay from site i (row) to site j (column), shape (n sites, n sites)
+        """
+        if self._slew_matrix is None:
+            if self.tessellation is not None:
+                vectors = self.tessellation.unit_vectors
+            else:
+                vectors = AltAzRotation.unit_vectors(
+                    self.default_locations.ra.radian,
+                    self.default_locations.dec.radian,
+                    axis=-1,
+                )
+            vectors = vectors.astype(self.dtype, copy=False)
+            # The separation ObservationVariables.update uses, in blocks of rows to bound the temporary memory
+            seperation = np.empty((len(vectors), len(vectors)), dtype=self.dtype)
+            for start in range(0, len(vectors), 256):
+                seperation[start : start + 256] = AltAzRotation.seperation(
+                    vectors[start : start + 256, np.newaxis], vectors
+                )
+            self._slew_matrix = self.slew_rate * seperation + self.readout_seconds
+        return self._slew_matrix
+
+    def site_delays(self, site: int, band: Union[str, None] = None):
+        """
+        Delay before an observation could start at each default site, if the telescope is currently pointed at one default site.
+        A single row lookup of ObservationVariables.slew_delay_matrix.
+
+        Args:
+            site (int): Index of the current pointing in ObservationVariables.default_locations
+            band (Union[str, None], optional): Filter to use for the next observation. Adds the filter change time if it is not the current band. Defaults to None.
+
+        Returns:
+            array: Delay in days to every default site, shape (n sites,)
+        """
+        delay = self.slew_delay_matrix()[site]
+        if (band is not None) and (band != self.band):
+            delay = delay + self.band_change_rate
+        return delay * 0.00001157407
 
     def _update_location(self, ra, decl):
+        ra, decl = self._nudge(
+            ra, decl, self.location.ra.deg.mean(), self.location.dec.deg.mean()
+        )
+        location = self._sky_coordinates(ra, decl)
+        return location
+
+    def _nudge(self, ra, decl, current_ra, current_decl):
+        """Offset a new pointing (degrees) by up to position_fuzz, more the further it is from the current (mean) pointing"""
+
         def nudge_factor(var_difference, position_element):
             scale = self.position_fuzz[position_element]
             midpoint = 25 if position_element == "ra" else 25
 
             return scale / (1 + np.exp(-1 * (var_difference - midpoint)))
 
-        ra_nudge = nudge_factor(abs(ra - self.location.ra.deg.mean()), "ra")
+        ra_nudge = nudge_factor(abs(ra - current_ra), "ra")
         ra = ra + ra_nudge
-        delc_nudge = nudge_factor(abs(decl - self.location.dec.deg.mean()), "decl")
+        delc_nudge = nudge_factor(abs(decl - current_decl), "decl")
         decl = decl + delc_nudge
+        return ra, decl
 
-        location = self._sky_coordinates(ra, decl)
-        return location
+    @property
+    def observator(self):
+        """astroplan.Observer at the observatory, created (and astroplan imported) the first time it is used"""
+        if self._observator is None:
+            self._observator = self._init_observator(*self._observatory_position)
+        return self._observator
 
     def _init_observator(
         self, obs_latitude_degrees, obs_logitude_degrees, obs_elevation_meters
     ):
+        import astroplan
+
         return astroplan.Observer(
             longitude=obs_logitude_degrees * self.degree,
             latitude=obs_latitude_degrees * self.degree,
             elevation=obs_elevation_meters * self.meters,
         )
 
-    def _default_locations(self, ra=None, decl=None, n_sites=None):
-        if (ra is None) & (decl is None):
+    def _default_locations(self, ra=None, decl=None, n_sites=None, nside=None):
+        if nside is not None:
+            ra, decl = self.tessellation.ra, self.tessellation.decl
+
+        elif (ra is None) & (decl is None):
             assert n_sites is not None
             decl = np.arange(-90, 90, step=int((90 * 2) / n_sites))
             ra = np.arange(0, 360, step=int(360 / n_sites))
@@ -235,34 +527,249 @@ class ObservationVariables:
 
         return self._sky_coordinates(ra, decl)
 
-    def _airmass(self, location):
-        alt = np.array(self._alt_az(location).alt.degree)
-        cos_zd = np.cos(np.radians(90) - alt * self.degree.to(self.radians))
-        a = numexpr.evaluate("462.46 + 2.8121/(cos_zd**2 + 0.22*cos_zd + 0.01)")
+    def _evaluate(self, expression, **variables):
+        """
+        Evaluate a numexpr expression in ObservationVariables.dtype.
+        Constants are passed as variables and cast, because numexpr treats float literals as float64 and would promote float32 arrays.
+        """
+        return numexpr.evaluate(
+            expression,
+            local_dict={
+                name: np.asarray(value, dtype=self.dtype)
+                for name, value in variables.items()
+            },
+        )
+
+    def _airmass(self, alt):
+        # One pass over the sites: cos(zenith distance) == sin(altitude), and the atmosphere scale a is written inline
+        cos_zd = "sin(alt * to_radians)"
+        a = f"(a0 + a1/({cos_zd}**2 + a2*{cos_zd} + a3))"
+        return self._evaluate(
+            f"where(alt < 0, nan, sqrt(({a}*{cos_zd})**2 + 2*{a} + 1) - {a}*{cos_zd})",
+            alt=alt,
+            to_radians=np.pi / 180,
+            nan=np.nan,
+            a0=462.46,
+            a1=2.8121,
+            a2=0.22,
+            a3=0.01,
+        )
+
+    @property
+    def time(self):
+        """
+        Current observation times as an astropy Time, None before the first update.
+        Only built (once per time) for astropy APIs that need it; the simulation itself runs on ObservationVariables.mjd.
+        """
+        if self.mjd is None:
+            return None
+        return self._cached("time", lambda: astropy.time.Time(self.mjd, format="mjd"))
+
+    def tt_utc(self):
+        """
+        TT - UTC (seconds) at each observation time, from the ERFA leap second table.
+        Times past the end of the table keep its last offset.
+
+        Returns:
+            array: Offsets, the shape of ObservationVariables.mjd
+        """
+
+        def offset():
+            with warnings.catch_warnings():
+                # ERFA flags dates it can't know future leap seconds for as "dubious"
+                warnings.simplefilter("ignore", erfa.ErfaWarning)
+                return erfa.dat(*erfa.jd2cal(2400000.5, self.mjd)) + 32.184
+
+        return self._cached("tt_utc", offset)
+
+    def ut1_utc(self):
+        """
+        UT1 - UTC (seconds) at each observation time, interpolated from the IERS table astropy is configured with.
+        Times outside of the table take its nearest value.
+
+        Returns:
+            array: Offsets, the shape of ObservationVariables.mjd
+        """
+        return self._cached(
+            "ut1_utc",
+            lambda: astropy.utils.iers.earth_orientation_table.get()
+            .ut1_utc(2400000.5, self.mjd)
+            .to_value(astropy.units.s),
+        )
+
+    def _cached(self, name, function):
+        """
+        Return an ephemeris quantity for the current time, only computing it the first time it is requested.
+        The cache is emptied by ObservationVariables.update when the time changes.
+        """
+        if name not in self._ephemeris:
+            self._ephemeris[name] = function()
+        return self._ephemeris[name]
+
+    def _ephemeris_positions(self):
+        return self._cached("positions", lambda: self.ephemeris(self.mjd))
+
+    def _ephemeris_coordinates(self, body, distance_unit):
+        positions = self._ephemeris_positions()
+        return astropy.coordinates.SkyCoord(
+            ra=positions[f"{body}_ra"] * self.degree,
+            dec=positions[f"{body}_decl"] * self.degree,
+            distance=positions[f"{body}_distance"] * distance_unit,
+            frame="gcrs",
+            obstime=self.time,
+        )
+
+    def _sun_coordinates(self):
+        if self.ephemeris is not None:
+            return self._cached(
+                "sun", lambda: self._ephemeris_coordinates("sun", astropy.units.AU)
+            )
+        return self._cached("sun", lambda: astropy.coordinates.get_sun(self.time))
+
+    def _moon_coordinates(self):
+        if self.ephemeris is not None:
+            return self._cached(
+                "moon", lambda: self._ephemeris_coordinates("moon", astropy.units.km)
+            )
+        return self._cached("moon", lambda: astropy.coordinates.get_moon(self.time))
+
+    def _moon_elongation(self):
+        return self._cached(
+            "moon_elongation",
+            lambda: self._sun_coordinates().separation(self._moon_coordinates()),
+        )
+
+    def _moon_phase(self):
+        from DeepSurveySim.Survey.ephemeris import moon_phase_angle
+
+        if self.ephemeris is not None:
+            return self._cached(
+                "moon_phase",
+                lambda: self._ephemeris_positions()["moon_phase"] * self.degree,
+            )
+        return self._cached(
+            "moon_phase",
+            lambda: moon_phase_angle(self._sun_coordinates(), self._moon_coordinates()),
+        )
+
+    def _moon_illumination(self):
+        if self.ephemeris is not None:
+            return self._cached(
+                "moon_illumination",
+                lambda: self._ephemeris_positions()["moon_illumination"],
+            )
+        return self._cached(
+            "moon_illumination",
+            lambda: (1 + np.cos(self._moon_phase())).to_value() / 2.0,
+        )
+
+    def _sun_alt(self):
+        return self._cached("sun_alt", lambda: self._alt_az(self._sun_coordinates())[0])
 
-        airmass = numexpr.evaluate("sqrt((a*cos_zd)**2 + 2*a + 1) - a * cos_zd")
-        airmass[(alt * self.to_radians) < 0] = np.nan
-        # airmass = airmass * self.radians.to(self.degree)
-        return airmass
+    def _moon_alt(self):
+        return self._cached(
+            "moon_alt", lambda: self._alt_az(self._moon_coordinates())[0]
+        )
+
+    def _altaz_frame(self):
+        return self._cached(
+            "altaz_frame",
+            lambda: astropy.coordinates.AltAz(obstime=self.time, location=self.site),
+        )
 
-    def _time(self, time):
-        return astropy.time.Time(np.asarray(time), format="mjd")
+    def _altaz_rotation(self):
+        return self._cached(
+            "altaz_rotation", lambda: AltAzRotation(self.site, self.time)
+        )
 
     def _alt_az(self, coordinates):
-        site = astropy.coordinates.EarthLocation.from_geodetic(
-            lon=self.observator.location.lon, lat=self.observator.location.lat
+        """Altitude and azimuth (degrees) of coordinates that broadcast against the observation times (the sun, moon, or reshaped sites)"""
+        if self.altaz_engine == "rotation":
+            return self._altaz_rotation().bodies(coordinates)
+
+        alt_az = coordinates.transform_to(self._altaz_frame())
+        return np.asarray(alt_az.alt.degree), np.asarray(alt_az.az.degree)
+
+    def _site_unit_vectors(self):
+        if (self._site_vectors is None) and (
+            self.tessellation is not None and self.location is self.default_locations
+        ):
+            self._site_vectors = self.tessellation.unit_vectors.astype(
+                self.dtype, copy=False
+            )
+
+        if self._site_vectors is None:
+            self._site_vectors = AltAzRotation.unit_vectors(
+                self.location.ra.radian, self.location.dec.radian, axis=-1
+            ).astype(self.dtype)
+        return self._site_vectors
+
+    def _site_alt_az(self):
+        """Altitude and azimuth (degrees) of the current pointing, shape (n sites, *time shape)"""
+        if self.altaz_engine == "rotation":
+            return self._altaz_rotation().sites(
+                self._site_unit_vectors(), paired=self.paired
+            )
+
+        return self._alt_az(self._site_axis(self.location))
+
+    def _site_axis(self, coordinates):
+        """Add axes to coordinates of the sites so they broadcast against the observation times, giving (n sites, *time shape) (or (n sites,) if paired)"""
+        if self.paired:
+            return coordinates
+        return coordinates.reshape(coordinates.shape + (1,) * self.mjd.ndim)
+
+    def _seperation(self, coordinates):
+        """
+        Angle (degrees) between every site and a body (the sun or moon) at every time, shape (n sites, *time shape) (or (n sites,) if paired).
+        One matrix product of the site and body unit vectors. The geocentric body position is compared directly to the ICRS sites,
+        which differs from SkyCoord.separation by the annual aberration (under 0.006 degrees)
+        """
+        body_vectors = AltAzRotation.unit_vectors(
+            coordinates.ra.radian, coordinates.dec.radian, axis=-1
+        ).astype(self.dtype)
+        if self.paired:
+            cos_seperation = np.sum(self._site_unit_vectors() * body_vectors, axis=-1)
+            return np.degrees(np.arccos(np.clip(cos_seperation, -1, 1)))
+        cos_seperation = self._site_unit_vectors() @ body_vectors.reshape(-1, 3).T
+        return np.degrees(np.arccos(np.clip(cos_seperation, -1, 1))).reshape(
+            (len(self.location),) + self.mjd.shape
         )
 
-        altaz_conversion = astropy.coordinates.AltAz(obstime=self.time, location=site)
-        alt_az = coordinates.transform_to(altaz_conversion)
+    def moon_angle_valid(self):
+        """
+        Check which sites are at least min_moon_angle (observatory configuration, in degrees) away from the moon
+
+        Returns:
+            array[bool]: If each site is far enough from the moon, shape (n sites, n observation times)
+        """
+        return self._variable("moon_seperation") >= self.min_moon_angle
 
-        return alt_az
+    def _broadcast_sites(self, value):
+        """Repeat a variable that is the same for every site as a read-only view, shape (n sites, *time shape), without copying it (if paired, each site already has its own time)"""
+        value = np.asarray(value, dtype=self.dtype)
+        if self.paired:
+            return np.broadcast_to(value, value.shape)
+        return np.broadcast_to(value, (len(self.location),) + value.shape)
 
     def _local_sidereal_time(self):
-        local_sidereal_time = self.observator.local_sidereal_time(
-            self.time, "mean"
-        ).to_value(self.degree)
-        return local_sidereal_time
+        """Local sidereal time (degrees), computed once per time and shared by every hour angle"""
+        if self.sidereal_time == "fast":
+            return self._cached(
+                "lst",
+                lambda: local_mean_sidereal_time(
+                    self.mjd,
+                    self.site.lon.deg,
+                    ut1_utc=self.ut1_utc() if self.iers == "offline" else 0.0,
+                    tt_utc=self.tt_utc(),
+                ),
+            )
+        return self._cached(
+            "lst",
+            lambda: self.observator.local_sidereal_time(self.time, "mean").to_value(
+                self.degree
+            ),
+        )
 
     def _ha(self, location):
         lst = self._local_sidereal_time()
@@ -285,26 +792,26 @@ class ObservationVariables:
         LST - https://en.wikipedia.org/wiki/Sidereal_time
 
         Returns:
-            dict[array]: Local Sideral Time, shape (n observation times, n sites)
+            dict[array]: Local Sideral Time, shape (n sites, n observation times)
         """
         lst = self._local_sidereal_time()
-        return {"lst": np.asarray([lst for _ in range(len(self.location))])}
+        return {"lst": self._broadcast_sites(lst)}
 
     def calculate_sun_location(self):
         """
         Calculate the position of the sun in Right Ascension/Declination (degrees)
 
         Returns:
-            dict[array]: Dictionary of RA/Decl of the Sun, shape (n observation times, n sites)
+            dict[array]: Dictionary of RA/Decl of the Sun, shape (n sites, n observation times)
         """
-        sun_coordinates = astropy.coordinates.get_sun(self.time)
+        sun_coordinates = self._sun_coordinates()
 
         sun_ra = sun_coordinates.ra.to_value(self.degree)
         sun_decl = sun_coordinates.dec.to_value(self.degree)
 
         return {
-            "sun_ra": np.asarray([sun_ra for _ in range(len(self.location))]),
-            "sun_decl": np.asarray([sun_decl for _ in range(len(self.location))]),
+            "sun_ra": self._broadcast_sites(sun_ra),
+            "sun_decl": self._broadcast_sites(sun_decl),
         }
 
     def calculate_sun_ha(self):
@@ -313,11 +820,20 @@ class ObservationVariables:
         https://en.wikipedia.org/wiki/Hour_angle
 
         Returns:
-            dict[array]: Sun HA, shape (n observation times, n sites)
+            dict[array]: Sun HA, shape (n sites, n observation times)
         """
-        sun_coordinates = astropy.coordinates.get_sun(self.time)
+        sun_coordinates = self._sun_coordinates()
         sun_ha = self._ha(sun_coordinates)
-        return {"sun_ha": np.asarray([sun_ha for _ in range(len(self.location))])}
+        return {"sun_ha": self._broadcast_sites(sun_ha)}
+
+    def calculate_sun_seperation(self):
+        """
+        Calculate the angular distance between the current pointing and the sun, in degrees
+
+        Returns:
+            dict[array]: Sun Seperation, shape (n sites, n observation times)
+        """
+        return {"sun_seperation": self._seperation(self._sun_coordinates())}
 
     def calculate_sun_airmass(self):
         """
@@ -325,27 +841,24 @@ class ObservationVariables:
         https://en.wikipedia.org/wiki/Air_mass_(astronomy)
 
         Returns:
-            dict[array]: Sun Airmass, shape (n observation times, n sites)
+            dict[array]: Sun Airmass, shape (n sites, n observation times)
         """
-        sun_coordinates = astropy.coordinates.get_sun(self.time)
-        sun_airmass = self._airmass(sun_coordinates)
+        sun_airmass = self._airmass(self._sun_alt())
 
-        return {
-            "sun_airmass": np.asarray([sun_airmass for _ in range(len(self.location))])
-        }
+        return {"sun_airmass": self._broadcast_sites(sun_airmass)}
 
     def calculate_moon_location(self):
-        moon_location = astropy.coordinates.get_moon(self.time)
+        moon_location = self._moon_coordinates()
         moon_ra = moon_location.ra.to_value(self.degree)
         moon_decl = moon_location.dec.to_value(self.degree)
         """ Calculate the moon position at current time
 
         Returns:
-            dict[array]: Moon location in degrees (Right Ascension/Declination), shape (n observation times, n sites)
+            dict[array]: Moon location in degrees (Right Ascension/Declination), shape (n sites, n observation times)
         """
         return {
-            "moon_ra": np.asarray([moon_ra for _ in range(len(self.location))]),
-            "moon_decl": np.asarray([moon_decl for _ in range(len(self.location))]),
+            "moon_ra": self._broadcast_sites(moon_ra),
+            "moon_decl": self._broadcast_sites(moon_decl),
         }
 
     def calculate_moon_brightness(self):
@@ -360,40 +873,25 @@ class ObservationVariables:
             - Moon Seperation: Angular distance (degrees) between point and the moon
 
         Returns:
-            dict[array]: Array of above moon brightness variables, shape (n observation times, n sites)
+            dict[array]: Array of above moon brightness variables, shape (n sites, n observation times)
         """
-        moon_location = astropy.coordinates.get_moon(self.time)
+        moon_location = self._moon_coordinates()
 
-        moon_phase = astroplan.moon.moon_phase_angle(self.time).to_value(self.degree)
-        moon_illumination = self.observator.moon_illumination(self.time)
+        moon_phase = self._moon_phase().to_value(self.degree)
+        moon_illumination = self._moon_illumination()
 
-        moon_elongation = (
-            astropy.coordinates.get_sun(self.time)
-            .separation(moon_location)
-            .to_value(self.degree)
-        )
+        moon_elongation = self._moon_elongation().to_value(self.degree)
         alpha = 180.0 - moon_elongation
 
         # Allen's _Astrophysical Quantities_, 3rd ed., p. 144
         moon_Vmagintude = -12.73 + 0.026 * np.abs(alpha) + 4e-9 * (alpha**4)
 
-        moon_seperation = np.asarray(
-            [
-                moon_location.separation(location).to_value(self.degree)
-                for location in self.location
-            ]
-        )
+        moon_seperation = self._seperation(moon_location)
         return {
-            "moon_elongation": np.asarray(
-                [moon_elongation for _ in range(len(self.location))]
-            ),
-            "moon_phase": np.asarray([moon_phase for _ in range(len(self.location))]),
-            "moon_illumination": np.asarray(
-                [moon_illumination for _ in range(len(self.location))]
-            ),
-            "moon_Vmagintude": np.asarray(
-                [moon_Vmagintude for _ in range(len(self.location))]
-            ),
+            "moon_elongation": self._broadcast_sites(moon_elongation),
+            "moon_phase": self._broadcast_sites(moon_phase),
+            "moon_illumination": self._broadcast_sites(moon_illumination),
+            "moon_Vmagintude": self._broadcast_sites(moon_Vmagintude),
             "moon_seperation": moon_seperation,
         }
 
@@ -403,11 +901,11 @@ class ObservationVariables:
         https://en.wikipedia.org/wiki/Hour_angle
 
         Returns:
-            dict[array]: Moon HA shape (n observation times, n sites)
+            dict[array]: Moon HA shape (n sites, n observation times)
         """
-        moon_location = astropy.coordinates.get_moon(self.time)
+        moon_location = self._moon_coordinates()
         moon_ha = self._ha(moon_location)
-        return {"moon_ha": np.asarray([moon_ha for _ in range(len(self.location))])}
+        return {"moon_ha": self._broadcast_sites(moon_ha)}
 
     def calculate_moon_airmass(self):
         """ "
@@ -415,24 +913,19 @@ class ObservationVariables:
         https://en.wikipedia.org/wiki/Air_mass_(astronomy)
 
         Returns:
-            dict[array]: Moon Airmass, shape (n observation times, n sites)
+            dict[array]: Moon Airmass, shape (n sites, n observation times)
         """
-        moon_location = astropy.coordinates.get_moon(self.time)
-        moon_airmass = self._airmass(moon_location)
-        return {
-            "moon_airmass": np.array([moon_airmass for _ in range(len(self.location))])
-        }
+        moon_airmass = self._airmass(self._moon_alt())
+        return {"moon_airmass": self._broadcast_sites(moon_airmass)}
 
     def calculate_observation_angles(self):
         """
         Calculate the altitude and azumultial angle of the current pointing, in degrees
 
         Returns:
-            dict[array]: Azimuthal angle (az), Altitude (alt) in degrees, shape (n observation times, n sites)
+            dict[array]: Azimuthal angle (az), Altitude (alt) in degrees, shape (n sites, n observation times)
         """
-        hzcrds = [self._alt_az(location) for location in self.location]
-        alt = np.asarray([hzcrd.alt.degree for hzcrd in hzcrds])
-        az = np.asarray([hzcrd.az.degree for hzcrd in hzcrds])
+        alt, az = self._site_alt_az()
 
         return {
             "az": az,
@@ -445,22 +938,18 @@ class ObservationVariables:
         https://en.wikipedia.org/wiki/Hour_angle
 
         Returns:
-            dict[array]: Pointing HA, shape (n observation times, n sites)
+            dict[array]: Pointing HA, shape (n sites, n observation times)
         """
-        return {"ha": np.asarray([self._ha(location) for location in self.location])}
+        return {"ha": np.asarray(self._ha(self._site_axis(self.location)))}
 
     def calculate_observation_airmass(self):
         """
         Calculate the current pointing's airmass
         https://en.wikipedia.org/wiki/Air_mass_(astronomy)
         Returns:
-            dict[array]: Pointing Airmass,  shape (n observation times, n sites)
+            dict[array]: Pointing Airmass,  shape (n sites, n observation times)
         """
-        return {
-            "airmass": np.asarray(
-                [self._airmass(location) for location in self.location]
-            )
-        }
+        return {"airmass": self._airmass(self._variable("alt"))}
 
     def calculate_seeing(self):
         """
@@ -468,14 +957,28 @@ class ObservationVariables:
         fwhw defintion - https://en.wikipedia.org/wiki/Full_width_at_half_maximum
 
         Returns:
-            dict[array]: Dictionary of Transverse seeing (pt_seeing), Seeing through the current filter (band_seeing), Full width at half maximum (fwhw) for the light signal, shape (n observation times, n sites)
+            dict[array]: Dictionary of Transverse seeing (pt_seeing), Seeing through the current filter (band_seeing), Full width at half maximum (fwhw) for the light signal, shape (n sites, n observation times)
 
         """
-        airmass = self.calculate_observation_airmass()["airmass"]
-        pt_seeing = self.seeing * airmass**0.6
+        airmass = self._variable("airmass")
         wavelength = self.band_wavelengths[self.band]
-        band_seeing = pt_seeing * (500.0 / wavelength) ** 0.2
-        fwhm = np.sqrt(band_seeing**2 + self.optics_fwhm**2)
+        band_factor = (500.0 / wavelength) ** 0.2
+
+        pt_seeing = self._evaluate(
+            "seeing * airmass**exponent",
+            seeing=self.seeing,
+            airmass=airmass,
+            exponent=0.6,
+        )
+        band_seeing = self._evaluate(
+            "pt_seeing * band_factor", pt_seeing=pt_seeing, band_factor=band_factor
+        )
+        fwhm = self._evaluate(
+            "sqrt((pt_seeing * band_factor)**2 + optics_fwhm**2)",
+            pt_seeing=pt_seeing,
+            band_factor=band_factor,
+            optics_fwhm=self.optics_fwhm,
+        )
 
         return {"pt_seeing": pt_seeing, "band_seeing": band_seeing, "fwhm": fwhm}
 
@@ -485,38 +988,103 @@ class ObservationVariables:
         Please view  https://github.com/ehneilsen/skybright/blob/b0e2d7e6e25131393ee76ce334ce1df1521e3659/skybright/skybright.py#L173 for details
 
         Returns:
-            dict[array]: Dictionary of "sky magnitude", "tau", "teff", shape (n observation times, n sites)
+            dict[array]: Dictionary of "sky magnitude", "tau", "teff", shape (n sites, n observation times)
         """
         if hasattr(self, "skybright"):
             m0 = self.skybright.m_zen[self.band]
-            nu = 10 ** (-1 * self.clouds / 2.5)
-            fwhm500 = self.calculate_seeing()["fwhm"]
-            moon_elongation = self.calculate_moon_brightness()["moon_elongation"]
-
-            sky_mag = np.asarray(
-                self.skybright(
-                    self.time.mjd.mean(),
-                    self.location.ra.degree,
-                    self.location.dec.degree,
+            fwhm500 = self._variable("fwhm")
+            moon_elongation = self._variable("moon_elongation")
+
+            from DeepSurveySim.Survey import SkyBrightnessTable
+
+            if isinstance(self.skybright, SkyBrightnessTable):
+                sky_mag = self.skybright(
                     self.band,
-                    moon_crds=astropy.coordinates.get_moon(self.time),
-                    moon_elongation=moon_elongation[0],
-                    sun_crds=astropy.coordinates.get_sun(self.time),
+                    zenith_distance=90 - self._variable("alt"),
+                    moon_elongation=moon_elongation,
+                    moon_alt=self._moon_alt(),
+                    moon_seperation=self._variable("moon_seperation"),
+                    sun_alt=self._sun_alt(),
                 )
+            else:
+                # One skybright call for every (site, time) pair, flattened site-major,
+                # with the sun and moon positions and elongation already cached for this update
+                if self.paired:
+                    shape = self.mjd.shape
+                    time_index = site_index = np.arange(self.mjd.size)
+                else:
+                    shape = (len(self.location),) + self.mjd.shape
+                    time_index = np.broadcast_to(
+                        np.arange(self.mjd.size).reshape(self.mjd.shape), shape
+                    ).ravel()
+                    site_index = np.broadcast_to(
+                        np.arange(len(self.location)).reshape(
+                            (-1,) + (1,) * self.mjd.ndim
+                        ),
+                        shape,
+                    ).ravel()
+
+                sky_mag = np.asarray(
+                    self.skybright(
+                        self.mjd.ravel()[time_index],
+                        self.location.ra.degree[site_index],
+                        self.location.dec.degree[site_index],
+                        self.band,
+                        moon_crds=self._moon_coordinates().ravel()[time_index],
+                        moon_elongation=np.ravel(moon_elongation),
+                        sun_crds=self._sun_coordinates().ravel()[time_index],
+                    )
+                ).reshape(shape)
+
+            # Cloud transparency (nu) is written inline, so tau is a single pass
+            tau = self._evaluate(
+                "(ten**(-clouds / magnitude) * (reference_fwhm / fwhm500))**2 * ten**((sky_mag - m0) / magnitude)",
+                ten=10,
+                magnitude=2.5,
+                clouds=self.clouds,
+                reference_fwhm=0.9,
+                fwhm500=fwhm500,
+                sky_mag=sky_mag,
+                m0=m0,
             )
 
-            tau = ((nu * (0.9 / fwhm500)) ** 2) * (10 ** ((sky_mag - m0) / 2.5))
-
-            teff = tau * self.readout_seconds * 0.00001157407 * 86400
+            teff = self._evaluate(
+                "tau * exposure",
+                tau=tau,
+                exposure=self.readout_seconds * 0.00001157407 * 86400,
+            )
 
             return {
-                "sky_magnitude": np.array(sky_mag),
-                "tau": np.array(tau),
-                "teff": np.array(teff),
+                "sky_magnitude": sky_mag,
+                "tau": tau,
+                "teff": teff,
             }
         else:
             return {}
 
+    def batch(self, times, variables: Union[list, None] = None):
+        """
+        Calculate variables for many observation times in one vectorized evaluation, at the current pointing and band.
+        No slew or filter change delay is added to the times. Use this to generate a full night or season offline without stepping a Survey.
+        The observator keeps its current time (and the calculations made for it) afterwards, see ObservationVariables.preserve.
+
+        Args:
+            times (array): Observation times in Mean Julian Date
+            variables (Union[list, None], optional): Variables to calculate. Defaults to all variables from ObservationVariables.name_to_function.
+
+        Returns:
+            dict[array]: Dense (not broadcast) arrays of each variable, shape (n sites, n observation times)
+        """
+        variables = (
+            variables if variables is not None else list(self.name_to_function().keys())
+        )
+        with self.preserve():
+            self.update(time=np.asarray(times, dtype=float).ravel())
+            return {
+                name: np.ascontiguousarray(value)
+                for name, value in self.calculate(variables).items()
+            }
+
     def observator_mapping(self):
 
         return [
@@ -530,6 +1098,7 @@ class ObservationVariables:
             self.calculate_moon_location,
             self.calculate_moon_brightness,
             self.calculate_moon_ha,
+            self.calculate_sun_seperation,
             self.calculate_seeing,
             self.calculate_lst,
             self.calculate_sky_magnitude,
@@ -543,9 +1112,59 @@ class ObservationVariables:
         Returns:
             dict: map between variable names and their functions.
         """
-        names = {}
-        for function in self.observator_mapping():
-            function_result = function()
-            function_map = {name: function for name in function_result.keys()}
-            names = {**function_map, **names}
-        return names
+        return {
+            name: getattr(self, function)
+            for name, (function, _) in self.variable_registry.items()
+            if hasattr(self, "skybright") or (name not in self.skybright_variables)
+        }
+
+    def required_functions(self, variables: list):
+        """
+        Functions needed to calculate the requested variables, including the variables they are calculated from.
+
+        Args:
+            variables (list): Names of variables, from ObservationVariables.name_to_function
+
+        Returns:
+            list[str]: Names of the functions, in the order they need to be run
+        """
+        order = []
+
+        def visit(name):
+            function, requirements = self.variable_registry[name]
+            for requirement in requirements:
+                visit(requirement)
+            if function not in order:
+                order.append(function)
+
+        for name in variables:
+            visit(name)
+        return order
+
+    def _calculate(self, function):
+        """Run a calculate_* function once per update, returning the same result for later requests"""
+        if function not in self._results:
+            self._results[function] = {
+                name: np.asarray(value, dtype=self.dtype)
+                for name, value in getattr(self, function)().items()
+            }
+        return self._results[function]
+
+    def _variable(self, name):
+        function, _ = self.variable_registry[name]
+        return self._calculate(function)[name]
+
+    def calculate(self, variables: list):
+        """
+        Calculate only the requested variables for the current time, location and band.
+        Every function needed is run once, and results shared between variables (e.g. "seeing" reuses "airmass", which reuses "alt").
+
+        Args:
+            variables (list): Names of variables, from ObservationVariables.name_to_function
+
+        Returns:
+            dict[array]: Requested variables, shape (n sites, n observation times)
+        """
+        for function in self.required_functions(variables):
+            self._calculate(function)
+        return {name: self._variable(name) for name in variables}
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class SurveyResults:
+    """
+    Results of a survey run, stored by column: one preallocated (n steps, n sites) array per variable and an (n steps,) array of times.
+
+    Steps are written in place with SurveyResults.append. When a run takes more steps than the capacity (e.g. a stop condition other than the timestep),
+    every column is doubled in size, so adding a step stays constant time on average.
+
+    Args:
+        variables (list[str]): Names of the columns with one value per site
+        n_sites (int): Number of sites observed each step
+        capacity (int, optional): Number of steps to allocate space for. Defaults to 1.
+        dtype (np.dtype, optional): Type of the variable columns. "valid" is always stored as bool and "mjd" as float64. Defaults to np.float32.
+
+    Examples:
+        >>> results = SurveyResults(["airmass", "reward"], n_sites=10, capacity=400)
+            results.append(60000.1, {"airmass": airmass, "reward": reward})
+            results["airmass"]  # (1, 10)
+            results["mjd"]  # (1,)
+    """
+
+    def __init__(
+        self,
+        variables: list,
+        n_sites: int,
+        capacity: int = 1,
+        dtype: np.dtype = np.float32,
+    ) -> None:
+        self.variables = list(variables)
+        self.n_sites = n_sites
+        self.n_steps = 0
+
+        capacity = max(int(capacity), 1)
+        self._columns = {
+            name: np.empty(
+                (capacity, n_sites), dtype=np.bool_ if name == "valid" else dtype
+            )
+            for name in self.variables
+        }
+        self._columns["mjd"] = np.empty(capacity, dtype=np.float64)
+
+    @property
+    def capacity(self):
+        return len(self._columns["mjd"])
+
+    def __len__(self):
+        return self.n_steps
+
+    def __getitem__(self, name: str):
+        return self._columns[name][: self.n_steps]
+
+    def __contains__(self, name: str):
+        return name in self._columns
+
+    def keys(self):
+        return self._columns.keys()
+
+    def _grow(self):
+        for name, column in self._columns.items():
+            grown = np.empty((2 * len(column),) + column.shape[1:], dtype=column.dtype)
+            grown[: self.n_steps] = column[: self.n_steps]
+            self._columns[name] = grown
+
+    def append(self, mjd: float, values: dict):
+        """
+        Write one step
+
+        Args:
+            mjd (float): Time of the step, in Mean Julian Date
+            values (dict): Value at each site (shape (n sites,)) of every column in SurveyResults.variables
+        """
+        if self.n_steps == self.capacity:
+            self._grow()
+        step = self.n_steps
+        self._columns["mjd"][step] = mjd
+        for name in self.variables:
+            self._columns[name][step] = values[name]
+        self.n_steps += 1
+
+    def extend(self, columns: dict):
+        """
+        Write several steps at once
+
+        Args:
+            columns (dict): "mjd" (shape (n new steps,)) and every column in SurveyResults.variables (shape (n new steps, n sites))
+        """
+        n_new = len(columns["mjd"])
+        while self.n_steps + n_new > self.capacity:
+            self._grow()
+        for name, column in self._columns.items():
+            column[self.n_steps : self.n_steps + n_new] = columns[name]
+        self.n_steps += n_new
+
+    def to_dict(self):
+        """
+        Results in the nested form <mjd>:{variable:[value]}, one entry per step (the form IO.SaveSimulation writes)
+
+        Returns:
+            dict: Results keyed by the time of each step
+        """
+        return {
+            float(mjd): {name: self[name][step] for name in self.variables}
+            for step, mjd in enumerate(self["mjd"])
+        }
@@ -0,0 +1,184 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Union
+
+import numpy as np
+
+from DeepSurveySim.Survey.survey import Survey
+from DeepSurveySim.Survey.observation_variables import ObservationVariables
+
+
+def _shared_arrays(buffer, layout):
+    """Numpy views of each (name, shape, dtype) in layout, packed one after another in buffer"""
+    arrays = {}
+    offset = 0
+    for name, shape, dtype in layout:
+        array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        arrays[name] = array
+        offset += array.nbytes
+    return arrays
+
+
+def _layout_size(layout):
+    return sum(
+        int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in layout
+    )
+
+
+# Per process state, set once by _init_worker and reused for every episode the process runs
+_worker = {}
+
+
+def _init_worker(
+    observatory_config, survey_config, survey_class, policy, memory_name, layout
+):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    _worker["memory"] = memory
+    _worker["results"] = _shared_arrays(memory.buf, layout)
+    _worker["survey"] = survey_class(observatory_config, survey_config)
+    _worker["policy"] = policy
+
+
+def _run_episodes(episodes, seeds):
+    """Run the given episodes in this worker, writing each into the shared result arrays. Returns the number of steps taken"""
+    survey = _worker["survey"]
+    results = _worker["results"]
+    policy = _worker["policy"]
+    n_steps = results["mjd"].shape[1]
+
+    total = 0
+    for episode, seed in zip(episodes, seeds):
+        survey.rng = np.random.default_rng(seed)
+        survey.reset()
+
+        observation = None
+        for step in range(n_steps):
+            action = (
+                survey._default_action()
+                if policy is None
+                else policy(survey, observation)
+            )
+            observation, reward, stop, _ = survey.step(action)
+
+            for name in survey.variables + ["valid"]:
+                results[name][episode, step] = survey._site_values(observation[name])
+            results["reward"][episode, step] = survey._site_values(reward)
+            results["mjd"][episode, step] = observation["mjd"]
+
+            if stop:
+                break
+
+        results["length"][episode] = step + 1
+        total += step + 1
+    return total
+
+
+class SurveyRollouts:
+    """
+    Run many survey episodes (each from a new start time) over a pool of worker processes.
+
+    Each worker builds its Survey (and with it the ObservationVariables, weather and ephemeris) once, and reuses it for every episode it is given.
+    Episodes write their steps straight into arrays in shared memory, so only episode numbers and seeds are sent between processes.
+    Every episode draws its start time from its own seed, spawned from the run's seed, so results do not depend on the number of workers.
+
+    Results are arrays of shape (n episodes, n steps, n sites), with one value per site at the time it was observed (see Survey._site_values).
+    n steps is stopping["timestep"]; episodes that stop earlier on another condition are padded with nan (and False for "valid"),
+    and their number of steps is given in "length".
+
+    Args:
+        obseravtory_config (dict): Setup parameters for Survey.ObservationVariables, the telescope configuration, as read by IO.ReadConfig
+        survey_config (dict): Parameters for the survey, including the stopping conditions, the validity conditions, the variables to collect, as read by IO.ReadConfig
+        n_workers (Union[int, None], optional): Number of processes. Defaults to the number of cpus.
+        policy (Union[Callable, None], optional): Function of (survey, previous observation) returning the next action, picklable (defined at module level). The previous observation is None on the first step. Defaults to None, staying on the default locations as Survey.__call__ does.
+        n_sites (Union[int, None], optional): Number of sites in each action of the policy. Defaults to the number of default locations.
+        survey_class (type, optional): Survey or a subclass to run. Defaults to Survey.
+
+    Examples:
+        >>> rollouts = SurveyRollouts(observatory_config, survey_config, n_workers=8)
+            results = rollouts(n_episodes=1000, seed=42)
+            results["airmass"]  # (1000, n steps, n sites)
+    """
+
+    def __init__(
+        self,
+        observatory_config: dict,
+        survey_config: dict,
+        n_workers: Union[int, None] = None,
+        policy: Union[Callable, None] = None,
+        n_sites: Union[int, None] = None,
+        survey_class: type = Survey,
+    ) -> None:
+        self.observatory_config = observatory_config
+        self.survey_config = survey_config
+        self.n_workers = n_workers if n_workers is not None else os.cpu_count()
+        self.policy = policy
+        self.survey_class = survey_class
+
+        self.n_steps = survey_config["stopping"]["timestep"]
+        if n_sites is None:
+            n_sites = len(ObservationVariables(observatory_config).default_locations)
+        self.n_sites = n_sites
+
+    def _layout(self, n_episodes):
+        site_shape = (n_episodes, self.n_steps, self.n_sites)
+        dtype = np.dtype(self.observatory_config["dtype"])
+        return [
+            (name, site_shape, dtype) for name in self.survey_config["variables"]
+        ] + [
+            ("valid", site_shape, np.bool_),
+            ("reward", site_shape, dtype),
+            ("mjd", (n_episodes, self.n_steps), np.float64),
+            ("length", (n_episodes,), np.int64),
+        ]
+
+    def __call__(self, n_episodes: int, seed: Union[int, None] = None):
+        """
+        Run the episodes
+
+        Args:
+            n_episodes (int): Number of episodes
+            seed (Union[int, None], optional): Seed for the start times. The same seed gives the same results. Defaults to None (a new random seed).
+
+        Returns:
+            dict[array]: survey_config["variables"], "valid" and "reward", shape (n episodes, n steps, n sites), "mjd", shape (n episodes, n steps), and "length", shape (n episodes,)
+        """
+        layout = self._layout(n_episodes)
+        memory = shared_memory.SharedMemory(create=True, size=_layout_size(layout))
+        try:
+            results = _shared_arrays(memory.buf, layout)
+            for name, array in results.items():
+                array[...] = np.nan if array.dtype.kind == "f" else 0
+
+            seeds = np.random.SeedSequence(seed).spawn(n_episodes)
+            chunks = np.array_split(
+                np.arange(n_episodes), min(n_episodes, self.n_workers * 4)
+            )
+            with ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=_init_worker,
+                initargs=(
+                    self.observatory_config,
+                    self.survey_config,
+                    self.survey_class,
+                    self.policy,
+                    memory.name,
+                    layout,
+                ),
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        _run_episodes,
+                        chunk.tolist(),
+                        [seeds[episode] for episode in chunk],
+                    )
+                    for chunk in chunks
+                ]
+                for future in futures:
+                    future.result()
+
+            results = {name: array.copy() for name, array in results.items()}
+        finally:
+            memory.close()
+            memory.unlink()
+        return results
@@ -0,0 +1,131 @@
+import time
+from typing import Union
+
+import numpy as np
+
+from DeepSurveySim.Survey.survey import Survey
+from DeepSurveySim.Survey.results import SurveyResults
+
+
+class GreedyScheduler:
+    """
+    Reference scheduler: at every step, observe the (site, band) with the highest score, the reward (survey_config["reward"]) less a cost for the slew, filter change and readout time to get there.
+
+    The site set is the survey's default locations (ObservationVariables.default_locations, e.g. a SkyTessellation grid).
+    Every site and band is scored in one batched pass: one ObservationVariables calculation per band over all sites (see Survey._observe).
+    Sky conditions change little over a slew, so each candidate is scored at the current time rather than at its own arrival time
+    (as Survey.evaluate_actions does), and the sun, moon and sidereal time are calculated once for every site. The slew is charged through the overhead cost instead.
+    The chosen action is then taken with Survey.step, so the recorded observations are exact.
+
+    Args:
+        survey (Survey): Survey to schedule
+        bands (Union[list[str], None], optional): Bands to choose from. Defaults to every band in ObservationVariables.band_wavelengths.
+        overhead_cost (Union[float, None], optional): Score lost per second of slew, filter change and readout. Defaults to None, 1 / survey_config["timestep_size"].
+
+    Examples:
+        >>> scheduler = GreedyScheduler(Survey(observatory_config, survey_config))
+            results = scheduler()
+            results["site"], results["band"]  # Index of the chosen site and band (GreedyScheduler.bands) of every step
+            scheduler.steps_per_second
+    """
+
+    def __init__(
+        self,
+        survey: Survey,
+        bands: Union[list, None] = None,
+        overhead_cost: Union[float, None] = None,
+    ) -> None:
+        self.survey = survey
+        self.bands = (
+            list(bands)
+            if bands is not None
+            else list(survey.observator.band_wavelengths.keys())
+        )
+        self.overhead_cost = (
+            overhead_cost if overhead_cost is not None else 1 / survey.timestep_size
+        )
+
+        locations = survey.observator.default_locations
+        self.ra = locations.ra.deg
+        self.decl = locations.dec.deg
+        self.steps_per_second = None
+
+    def scores(self):
+        """
+        Score of every band and site from the survey's current time, pointing and band, without changing the survey.
+
+        Returns:
+            array: Reward less the overhead cost, shape (n bands, n sites)
+        """
+        survey = self.survey
+        observator = survey.observator
+        shape = (len(self.bands), len(self.ra))
+        band = np.broadcast_to(np.array(self.bands, dtype=object)[:, np.newaxis], shape)
+
+        with observator.preserve():
+            seperation = observator._angular_distance(
+                observator._sky_coordinates(self.ra, self.decl), paired=False
+            )
+            overhead = observator._delay_days(
+                seperation[np.newaxis], band != observator.band
+            )
+
+            observation = survey._observe(
+                np.full(shape, survey.time),
+                np.broadcast_to(self.ra, shape),
+                np.broadcast_to(self.decl, shape),
+                band,
+            )
+        observation["valid"] = survey._validity(observation) & observation.pop(
+            "moon_valid"
+        )
+        reward = survey._reward(observation)
+        return reward - self.overhead_cost * overhead / 0.00001157407
+
+    def action(self):
+        """
+        Highest scoring site and band
+
+        Returns:
+            Tuple : action (dict, "location" with the site's ra, decl, and "band", for Survey.step), site index, band index
+        """
+        scores = self.scores()
+        band, site = np.unravel_index(np.nanargmax(scores), scores.shape)
+        action = {
+            "location": {"ra": self.ra[[site]], "decl": self.decl[[site]]},
+            "band": self.bands[band],
+        }
+        return action, site, band
+
+    def __call__(self):
+        """
+        Run the survey from its current state with the greedy choice at every step, until the stopping condition is met.
+        The speed of the run is kept in GreedyScheduler.steps_per_second.
+
+        Returns:
+            SurveyResults: survey_config["variables"], "valid", "reward", "site" and "band" (indices into the default locations and GreedyScheduler.bands), each of shape (n steps, 1), and "mjd", shape (n steps,)
+        """
+        survey = self.survey
+        results = SurveyResults(
+            survey.variables + ["valid", "reward", "site", "band"],
+            n_sites=1,
+            capacity=survey.stop_config["timestep"] - survey.timestep,
+        )
+
+        start = time.perf_counter()
+        stop = False
+        while not stop:
+            action, site, band = self.action()
+            observation, reward, stop, _ = survey.step(action)
+
+            observation["reward"] = reward
+            values = {
+                name: survey._site_values(observation[name])
+                for name in survey.variables + ["valid", "reward"]
+            }
+            values["site"] = site
+            values["band"] = band
+            results.append(observation["mjd"], values)
+
+        self.steps_per_second = len(results) / (time.perf_counter() - start)
+        return results
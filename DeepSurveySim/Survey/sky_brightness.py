@@ -0,0 +1,293 @@
+import itertools
+import os
+import tempfile
+from configparser import ConfigParser
+
+import numpy as np
+import astropy.coordinates
+import astropy.time
+import astropy.units
+
+
+class SkyBrightnessTable:
+    """
+    Sky brightness from skybright's MoonSkyModel, precomputed on a grid of observing geometry and interpolated with numpy at runtime.
+
+    The grid has one axis per variable in SkyBrightnessTable.axes (degrees), with `bins` evenly spaced nodes over SkyBrightnessTable.ranges, for every filter band.
+    It is built once by evaluating skybright at random times and pointings above the horizon while the sun is down,
+    and averaging the samples onto their nearest node. Nodes no sample reached are filled from their neighbours.
+    The table is saved as a .npz file; once it exists skybright (and PalPy) are not needed.
+
+    The table is only as fine as its nodes. With the default 10 bins they are 10 degrees apart in sun altitude, too coarse for twilight,
+    where the sky brightens by magnitudes between sun altitudes of -18 and 0 degrees: a twilight-dependent model is off by about 0.24 mag at a sun altitude of -6 degrees.
+    More bins follow it better, at bins^5 floats per band (and n_samples should grow with the number of nodes).
+
+    Args:
+        path (str, optional): Path to the .npz table. If "default", the table is stored in the package settings directory. Defaults to "default".
+        skybright_config (str, optional): Path of the skybright configuration used to build the table, "default" for the one shipped in settings. Defaults to "default".
+        n_samples (int, optional): Number of skybright evaluations per band used to build the table. Defaults to 1000000.
+        bins (int, optional): Number of nodes along each axis (see above for the resolution). Defaults to 10.
+        start_mjd (float, optional): Start of the time span the samples are drawn from, in Mean Julian Date. Defaults to 58849.
+        end_mjd (float, optional): End of the time span the samples are drawn from, in Mean Julian Date. Defaults to 62502.
+
+    Examples:
+        >>> table = SkyBrightnessTable("default", n_samples=200000)
+            sky_magnitude = table("g", zenith_distance=30, moon_elongation=90, moon_alt=20, moon_seperation=60, sun_alt=-30)
+    """
+
+    axes = [
+        "zenith_distance",
+        "moon_elongation",
+        "moon_alt",
+        "moon_seperation",
+        "sun_alt",
+    ]
+    ranges = {
+        "zenith_distance": (0, 90),
+        "moon_elongation": (0, 180),
+        "moon_alt": (-90, 90),
+        "moon_seperation": (0, 180),
+        "sun_alt": (-90, 0),
+    }
+
+    def __init__(
+        self,
+        path: str = "default",
+        skybright_config: str = "default",
+        n_samples: int = 1000000,
+        bins: int = 10,
+        start_mjd: float = 58849,
+        end_mjd: float = 62502,
+    ) -> None:
+        if path == "default":
+            path = (
+                f"{os.path.dirname(__file__).rstrip('/')}/../settings/"
+                f"skybright_table_{bins}bins_{n_samples}.npz"
+            )
+        self.path = path
+
+        if not os.path.exists(self.path):
+            model, site = SkyBrightnessTable.skybright_model(skybright_config)
+            SkyBrightnessTable.build(
+                self.path, model, site, n_samples, bins, start_mjd, end_mjd
+            )
+
+        with np.load(self.path) as table:
+            self.bands = [str(band) for band in table["bands"]]
+            self.grid = table["grid"]
+            self.m_zen = dict(zip(self.bands, table["m_zen"]))
+
+    @staticmethod
+    def skybright_model(skybright_config: str = "default"):
+        """
+        Create skybright's MoonSkyModel and the observatory site it is configured for
+
+        Args:
+            skybright_config (str, optional): Path of the skybright configuration, "default" for the one shipped in settings. Defaults to "default".
+
+        Returns:
+            tuple: skybright.MoonSkyModel, astropy.coordinates.EarthLocation
+        """
+        try:
+            from skybright import skybright
+
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                "ERROR: skybright module not found, please install it from https://github.com/ehneilsen/skybright.git"
+            )
+
+        config_path = (
+            f"{os.path.dirname(__file__).rstrip('/')}/../settings/skybright_config.conf"
+            if skybright_config == "default"
+            else skybright_config
+        )
+        config = ConfigParser()
+        config.read(config_path)
+
+        site = astropy.coordinates.EarthLocation.from_geodetic(
+            lon=config.getfloat("Observatory Position", "longitude")
+            * astropy.units.deg,
+            lat=config.getfloat("Observatory Position", "latitude") * astropy.units.deg,
+            height=config.getfloat("Observatory Position", "elevation")
+            * astropy.units.m,
+        )
+        return skybright.MoonSkyModel(config), site
+
+    @staticmethod
+    def build(
+        path: str,
+        model,
+        site,
+        n_samples: int,
+        bins: int,
+        start_mjd: float,
+        end_mjd: float,
+        chunk: int = 100000,
+        seed: int = 0,
+    ):
+        """
+        Sample the sky model and write the table to path.
+        The file is written to a temporary name and moved into place, so workers building the same table at once do not read a partial file.
+
+        The geometry of each sample is computed for `site`, which should be the site the model is configured for,
+        since skybright derives altitudes from the time and position itself.
+
+        Args:
+            path (str): Where to save the table (.npz)
+            model (skybright.MoonSkyModel): Sky model, called as model(mjd, ra, decl, band, moon_crds=, moon_elongation=, sun_crds=)
+            site (astropy.coordinates.EarthLocation): Location the model is configured for
+            n_samples (int): Number of model evaluations per band
+            bins (int): Number of nodes along each axis
+            start_mjd (float): Start of the time span samples are drawn from, in Mean Julian Date
+            end_mjd (float): End of the time span samples are drawn from, in Mean Julian Date
+            chunk (int, optional): Number of samples computed at once. Defaults to 100000.
+            seed (int, optional): Random seed for the samples. Defaults to 0.
+        """
+        rng = np.random.default_rng(seed)
+        bands = list(model.m_zen.keys())
+        shape = (len(bands),) + (bins,) * len(SkyBrightnessTable.axes)
+        sums = np.zeros(shape)
+        counts = np.zeros(shape)
+
+        for start in range(0, n_samples, chunk):
+            n = min(chunk, n_samples - start)
+            mjd = rng.uniform(start_mjd, end_mjd, n)
+            time = astropy.time.Time(mjd, format="mjd")
+            frame = astropy.coordinates.AltAz(obstime=time, location=site)
+
+            # Uniform over the visible hemisphere
+            pointing = astropy.coordinates.SkyCoord(
+                alt=np.degrees(np.arcsin(rng.uniform(0, 1, n))) * astropy.units.deg,
+                az=rng.uniform(0, 360, n) * astropy.units.deg,
+                frame=frame,
+            )
+            sun = astropy.coordinates.get_sun(time)
+            moon = astropy.coordinates.get_moon(time)
+            moon_altaz = moon.transform_to(frame)
+
+            features = {
+                "zenith_distance": 90 - pointing.alt.deg,
+                "moon_elongation": sun.separation(moon).deg,
+                "moon_alt": moon_altaz.alt.deg,
+                "moon_seperation": moon_altaz.separation(pointing).deg,
+                "sun_alt": sun.transform_to(frame).alt.deg,
+            }
+            night = features["sun_alt"] < 0
+            index = tuple(
+                SkyBrightnessTable._nearest_node(name, features[name][night], bins)
+                for name in SkyBrightnessTable.axes
+            )
+
+            icrs = pointing[night].icrs
+            for band_index, band in enumerate(bands):
+                sky_magnitude = np.asarray(
+                    model(
+                        mjd[night],
+                        icrs.ra.deg,
+                        icrs.dec.deg,
+                        band,
+                        moon_crds=moon[night],
+                        moon_elongation=features["moon_elongation"][night],
+                        sun_crds=sun[night],
+                    ),
+                    dtype=float,
+                )
+                np.add.at(sums[band_index], index, sky_magnitude)
+                np.add.at(counts[band_index], index, 1)
+
+        with np.errstate(invalid="ignore"):
+            grid = sums / counts
+        grid = np.stack([SkyBrightnessTable._fill_empty(values) for values in grid])
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=directory, suffix=".npz", delete=False
+        ) as f:
+            np.savez(
+                f,
+                bands=np.array(bands),
+                grid=grid,
+                m_zen=np.array([model.m_zen[band] for band in bands], dtype=float),
+            )
+        os.replace(f.name, path)
+
+    @staticmethod
+    def _position(name, values, bins):
+        """Fractional node index of values along one axis, clipped to the grid"""
+        low, high = SkyBrightnessTable.ranges[name]
+        return (np.clip(values, low, high) - low) / (high - low) * (bins - 1)
+
+    @staticmethod
+    def _nearest_node(name, values, bins):
+        return np.rint(SkyBrightnessTable._position(name, values, bins)).astype(int)
+
+    @staticmethod
+    def _fill_empty(grid):
+        """Replace nodes without samples (nan) with the mean of their filled neighbours, growing outwards until none are left"""
+        grid = grid.copy()
+        if np.all(np.isnan(grid)):
+            raise ValueError("No sky model samples, increase n_samples")
+
+        while np.any(np.isnan(grid)):
+            padded = np.pad(grid, 1, constant_values=np.nan)
+            neighbours = []
+            for axis in range(grid.ndim):
+                for step in (-1, 1):
+                    shifted = np.roll(padded, step, axis=axis)
+                    neighbours.append(shifted[(slice(1, -1),) * grid.ndim])
+            with np.errstate(invalid="ignore"):
+                neighbours = np.stack(neighbours)
+                count = np.sum(~np.isnan(neighbours), axis=0)
+                mean = np.nansum(neighbours, axis=0) / count
+            empty = np.isnan(grid) & (count > 0)
+            grid[empty] = mean[empty]
+        return grid
+
+    def __call__(
+        self, band, zenith_distance, moon_elongation, moon_alt, moon_seperation, sun_alt
+    ):
+        """
+        Interpolate the sky brightness (multilinear between the grid nodes). Values outside of SkyBrightnessTable.ranges are clipped to the edges.
+
+        Args:
+            band (str): Filter band
+            zenith_distance (array): Zenith distance of the pointing, in degrees
+            moon_elongation (array): Angle between the sun and moon, in degrees
+            moon_alt (array): Altitude of the moon, in degrees
+            moon_seperation (array): Angle between the pointing and the moon, in degrees
+            sun_alt (array): Altitude of the sun, in degrees
+
+        Returns:
+            array: Sky magnitude (mag/arcsec^2), the broadcast shape of the inputs
+        """
+        grid = self.grid[self.bands.index(band)]
+        bins = grid.shape[0]
+        values = np.broadcast_arrays(
+            *[
+                np.asarray(value, dtype=float)
+                for value in (
+                    zenith_distance,
+                    moon_elongation,
+                    moon_alt,
+                    moon_seperation,
+                    sun_alt,
+                )
+            ]
+        )
+
+        lower, weights = [], []
+        for name, value in zip(SkyBrightnessTable.axes, values):
+            position = SkyBrightnessTable._position(name, value, bins)
+            index = np.minimum(position.astype(int), bins - 2)
+            lower.append(index)
+            weights.append(position - index)
+
+        sky_magnitude = np.zeros(values[0].shape)
+        for corner in itertools.product((0, 1), repeat=len(lower)):
+            weight = np.ones(values[0].shape)
+            for offset, axis_weight in zip(corner, weights):
+                weight = weight * (axis_weight if offset else 1 - axis_weight)
+            node = tuple(index + offset for index, offset in zip(lower, corner))
+            sky_magnitude += weight * grid[node]
+        return sky_magnitude
@@ -1,9 +1,14 @@
+import json
+import os
+
 import numpy as np
+import numexpr
 
 from DeepSurveySim.Survey.observation_variables import (
     ObservationVariables,
 )
 
+from DeepSurveySim.Survey.results import SurveyResults
 from DeepSurveySim.IO.read_config import ReadConfig
 
 
@@ -45,14 +50,33 @@ class Survey:
         self.stop_config = survey_config["stopping"]
         self.validity_config = survey_config["constaints"]
 
+        self._validity_expression = Survey._compile_conditions(
+            self.validity_config, lesser=">=", join="&"
+        )
+        self._stop_expression = Survey._compile_conditions(
+            {
+                name: condition
+                for name, condition in self.stop_config.items()
+                if name != "timestep"
+            },
+            lesser="<=",
+            join="|",
+        )
+        self._reward_expression = self._compile_reward()
+
         self.timestep_size = survey_config["timestep_size"]
         self.start_time = survey_config["start_time"]
         self.invalid_penality = survey_config["invalid_penality"]
 
+        self.rng = np.random.default_rng()
+        self.initial_band = self.observator.band
         self.time = self._start_time()
         self.observator.update(time=self.time)
 
         self.save_config = survey_config["save"]
+        self.checkpoint_config = survey_config["checkpoint"]
+        self._checkpointed = {}
+        self._checkpoint_files = {}
         self.timestep = 0
 
         var_dict = self.observator.name_to_function()
@@ -60,74 +84,102 @@ class Survey:
         self.observatory_variables = {
             key: var_dict[key] for key in survey_config["variables"]
         }
+        self.variables = list(self.observatory_variables.keys())
 
     def _start_time(self):
         if self.start_time == "random":
-            return np.random.default_rng().integers(low=55000, high=70000)
+            return self.rng.integers(low=55000, high=70000)
         else:
             return self.start_time
 
     def reset(self):
-        """Return the observer to its inital position, the time to the start time, and the timestep to 0."""
+        """Return the observer to its inital position (the default locations) and band, the time to the start time, and the timestep to 0."""
         self.timestep = 0
         self.time = self._start_time()
-        self.observator.update(time=self.time)
+        self._point_at_defaults(self.time, self.initial_band)
 
-    def _validity(self, observation):
-        valid = True
+    def _point_at_defaults(self, time, band, paired=False):
+        """Point the observator at the default locations with band at time, with no slew or filter change"""
+        self.observator.location = self.observator.default_locations
+        self.observator._site_vectors = None
+        self.observator.update(time=time, band=band, delay=False, paired=paired)
 
-        for condition in self.validity_config:
-            if self.validity_config[condition]["lesser"]:
-                valid_condition = (
-                    observation[condition] >= self.validity_config[condition]["value"]
-                )
-            else:
-                valid_condition = (
-                    observation[condition] <= self.validity_config[condition]["value"]
-                )
-
-            valid = valid & valid_condition
-        return valid
+    @staticmethod
+    def _compile_conditions(conditions: dict, lesser: str, join: str):
+        """
+        Combine threshold conditions into one numexpr expression, evaluated in a single pass over every site and time.
 
-    def _stop_condition(self, observation):
-        """Returns true when stopping condition has been met"""
-        stop = False
-        stop = stop or self.timestep >= self.stop_config["timestep"]
-
-        other_conditions = [
-            condition
-            for condition in self.stop_config.keys()
-            if condition != "timestep"
-        ]
-        for condition in other_conditions:
-            if self.stop_config[condition]["lesser"]:
-                stop_condition = (
-                    observation[condition] <= self.stop_config[condition]["value"]
-                )
-            else:
-                stop_condition = (
-                    observation[condition] >= self.stop_config[condition]["value"]
-                )
+        Args:
+            conditions (dict): {variable: {"value": threshold, "lesser": bool}}, as in survey_config["constaints"] or ["stopping"]
+            lesser (str): Comparison (">=" or "<=") of the variable to its threshold when "lesser" is true, the opposite is used otherwise
+            join (str): Operator combining the conditions, "&" (all must hold) or "|" (any)
 
-            stop = stop or stop_condition
+        Returns:
+            tuple: expression (None without conditions), and (variable, threshold name, threshold value) of each condition
+        """
+        opposite = {">=": "<=", "<=": ">="}
+        terms, thresholds = [], []
+        for index, (name, condition) in enumerate(conditions.items()):
+            operator = lesser if condition["lesser"] else opposite[lesser]
+            terms.append(f"({name} {operator} threshold_{index})")
+            thresholds.append((name, f"threshold_{index}", condition["value"]))
+        expression = f" {join} ".join(terms) if terms else None
+        return expression, thresholds
+
+    def _compile_reward(self):
+        """Reward as one numexpr expression of the monitored variable, "valid", and the thresholds in ("threshold", "penality")"""
+        reward = self.reward_config["monitor"]
+        if self.reward_config["min"]:
+            reward = f"(1 / {reward})"
+        if "threshold" in self.reward_config:
+            reward = f"where({reward} > threshold, {reward}, penality)"
+        return f"where(valid, {reward}, penality)"
+
+    @staticmethod
+    def _evaluate_conditions(compiled, observation):
+        expression, thresholds = compiled
+        variables = {}
+        for name, threshold_name, value in thresholds:
+            variable = np.asarray(observation[name])
+            variables[name] = variable
+            # Compare in the type numpy would use, so float32 variables are not promoted
+            variables[threshold_name] = np.asarray(
+                value, dtype=np.result_type(variable, value)
+            )
+        return numexpr.evaluate(expression, local_dict=variables)
 
-        return np.any(stop)
+    def _validity(self, observation):
+        """Returns true for each site and time that meets every condition of survey_config["constaints"]"""
+        if self._validity_expression[0] is None:
+            return True
+        return Survey._evaluate_conditions(self._validity_expression, observation)
 
-    def _reward(self, observation):
-        metric = self.reward_config["monitor"]
-        reward = observation[metric]
+    def _stop_conditions(self, observation):
+        """Where any stopping condition other than the timestep is met, per site and time (False without other conditions)"""
+        if self._stop_expression[0] is None:
+            return np.array(False)
+        return Survey._evaluate_conditions(self._stop_expression, observation)
 
-        if self.reward_config["min"]:
-            reward = reward ** (-1)
+    def _stop_condition(self, observation):
+        """Returns true when stopping condition has been met"""
+        return bool(
+            (self.timestep >= self.stop_config["timestep"])
+            or np.any(self._stop_conditions(observation))
+        )
 
+    def _reward(self, observation):
+        metric = np.asarray(observation[self.reward_config["monitor"]])
+        dtype = np.result_type(metric, self.invalid_penality)
+        variables = {
+            self.reward_config["monitor"]: metric,
+            "valid": np.asarray(observation["valid"], dtype=bool),
+            "penality": np.asarray(self.invalid_penality, dtype=dtype),
+        }
         if "threshold" in self.reward_config:
-            reward = np.where(
-                reward > self.reward_config["threshold"], reward, self.invalid_penality
+            variables["threshold"] = np.asarray(
+                self.reward_config["threshold"], dtype=dtype
             )
-
-        reward = np.where(~observation["valid"], self.invalid_penality, reward)
-
-        return reward
+        return numexpr.evaluate(self._reward_expression, local_dict=variables)
 
     def step(self, action: dict):
         """
@@ -143,48 +195,316 @@ class Survey:
             action["time"] = np.array(self.time)
 
         self.observator.update(**action)
-        self.time = self.observator.time.mjd.mean()
+        self.time = float(np.mean(self.observator.mjd))
         observation = self._observation_calculation()
         reward = self._reward(observation)
         self.timestep += 1
 
-        stop = self._stop_condition(observation)
+        stop = self._stop_condition({**observation, "reward": reward})
 
         log = {}
 
         return observation, reward, stop, log
 
-    def _observation_calculation(self):
+    def _default_action(self):
+        """Action that keeps the telescope on the default locations (ObservationVariables.default_locations)"""
+        return {
+            "location": {
+                "ra": self.observator.default_locations.ra.deg,
+                "decl": self.observator.default_locations.dec.deg,
+            }
+        }
+
+    def _site_values(self, value):
+        """
+        Value of each site at its own observation time, shape (n sites,), from an observation variable (shape (n sites, *time shape), or (n sites,) if the observator is paired).
+        Moving to a location gives every site its own time (after its slew), so each site is read at that time.
+        """
+        n_sites = len(self.observator.location)
+        if self.observator.paired:
+            return np.broadcast_to(value, (n_sites,))
+        n_times = self.observator.mjd.size
+        value = np.broadcast_to(value, (n_sites,) + self.observator.mjd.shape).reshape(
+            n_sites, n_times
+        )
+        if n_times == 1:
+            return value[:, 0]
+        if n_times == n_sites:
+            return np.diagonal(value)
+        raise ValueError(
+            f"Cannot pair {n_sites} sites with {n_times} observation times"
+        )
+
+    def _observe(self, mjd, ra, decl, band):
+        """
+        Calculate survey_config["variables"] and the moon avoidance for many (time, pointing, band) combinations, with one ObservationVariables calculation per band.
+        Each calculation covers the distinct pointings at the distinct times when that is no larger than the combinations themselves
+        (e.g. many surveys at the default locations), and gathers each combination from it. Otherwise only the combinations are calculated,
+        each site paired with its own time (see ObservationVariables.update), so the cost is linear in their number.
+        The observator is left at the pointings, times and band of the last calculation.
 
+        Args:
+            mjd (array): Observation times, in Mean Julian Date
+            ra (array): Pointings in degrees, the shape of mjd
+            decl (array): Pointings in degrees, the shape of mjd
+            band (array): Band of each observation, the shape of mjd
+
+        Returns:
+            dict[array]: survey_config["variables"] and "moon_valid", the shape of mjd
+        """
         observation = {}
-        for var_name in self.observatory_variables:
-            observation[var_name] = self.observatory_variables[var_name]()[var_name]
+        for band_name in np.unique(band):
+            selected = band == band_name
+            sites, site_index = np.unique(
+                np.stack([ra[selected], decl[selected]], axis=-1),
+                axis=0,
+                return_inverse=True,
+            )
+            times, time_index = np.unique(mjd[selected], return_inverse=True)
+
+            paired = len(sites) * len(times) > np.count_nonzero(selected)
+            if paired:
+                self.observator.update(
+                    time=mjd[selected],
+                    location={"ra": ra[selected], "decl": decl[selected]},
+                    band=band_name,
+                    delay=False,
+                    paired=True,
+                )
+            else:
+                self.observator.update(
+                    time=times,
+                    location={"ra": sites[:, 0], "decl": sites[:, 1]},
+                    band=band_name,
+                    delay=False,
+                )
+            values = self.observator.calculate(self.variables)
+            values["moon_valid"] = self.observator.moon_angle_valid()
+
+            for name, value in values.items():
+                if paired:
+                    value = np.broadcast_to(value, mjd[selected].shape)
+                else:
+                    value = np.broadcast_to(value, (len(sites), len(times)))[
+                        site_index.ravel(), time_index.ravel()
+                    ]
+                if name not in observation:
+                    observation[name] = np.empty(mjd.shape, dtype=value.dtype)
+                observation[name][selected] = value
+        return observation
 
-        observation["valid"] = self._validity(observation=observation)
+    def evaluate_actions(self, candidates: dict):
+        """
+        Observation, validity and reward of K candidate actions, each evaluated as if it were the next step, without changing the survey.
+        Every candidate is delayed by its own slew (from the current pointing), filter change and readout time, as Survey.step would.
+        All candidates are evaluated together, each at its own arrival time (see Survey._observe), and the observator is returned to its time, pointing and band afterwards.
+
+        Args:
+            candidates (dict): "location" (dict with ra, decl in degrees, shape (K,)), "band" (str, or one per candidate) (optional, defaults to the current band), "time" (Mean Julian Date, scalar or shape (K,)) (optional, defaults to the current time)
+
+        Returns:
+            Tuple : observation (dict, containing survey_config["variables"], "valid" and "mjd", shape (K,)), reward (array, shape (K,))
+        """
+        ra = np.atleast_1d(np.asarray(candidates["location"]["ra"], dtype=float))
+        decl = np.atleast_1d(np.asarray(candidates["location"]["decl"], dtype=float))
+        ra, decl = self.observator._nudge(
+            ra,
+            decl,
+            self.observator.location.ra.deg.mean(),
+            self.observator.location.dec.deg.mean(),
+        )
+        band = candidates.get("band")
+        band = np.broadcast_to(
+            np.asarray(
+                band if band is not None else self.observator.band, dtype=object
+            ),
+            ra.shape,
+        )
+        time = np.broadcast_to(
+            np.asarray(candidates.get("time", self.time), dtype=float), ra.shape
+        )
+
+        with self.observator.preserve():
+            location = self.observator._sky_coordinates(ra, decl)
+            delay = self.observator._delay_days(
+                self.observator._angular_distance(location, paired=False),
+                band != self.observator.band,
+            )
+            mjd = time + np.broadcast_to(delay, ra.shape)
+            observation = self._observe(mjd, ra, decl, band)
+
+        observation["valid"] = self._validity(observation) & observation.pop(
+            "moon_valid"
+        )
+        observation["mjd"] = mjd
+        reward = self._reward(observation)
+        return observation, reward
+
+    def _observation_calculation(self):
+
+        observation = self.observator.calculate(self.variables)
+
+        observation["valid"] = (
+            self._validity(observation=observation) & self.observator.moon_angle_valid()
+        )
         observation["mjd"] = np.array(self.time)
 
         return observation
 
     def __call__(self):
         """
-        Run the survey with the initial location until the stopping condition is met, return the completed survey
+        Run the survey with the initial location until the stopping condition is met, return the completed survey.
+        If survey_config["checkpoint"]["path"] is set, the run is checkpointed there every survey_config["checkpoint"]["every"] steps (see Survey.checkpoint).
 
         Returns:
-            dict: Evaluated survey in the form of time:{"variable_name":[variable_value]}
+            SurveyResults: Evaluated survey, with survey_config["variables"], "valid" and "reward" each of shape (n steps, n sites), and "mjd", shape (n steps,)
         """
+        results = SurveyResults(
+            self.variables + ["valid", "reward"],
+            n_sites=len(self.observator.default_locations),
+            capacity=self.stop_config["timestep"] - self.timestep,
+        )
+        self._checkpointed = {}
+        self._checkpoint_files = {}
+        return self._run(results, self.checkpoint_config["path"])
+
+    def _run(self, results, checkpoint_path):
         stop = False
-        results = {}
         while not stop:
-            observation, reward, stop, _ = self.step(self.observator.default_locations)
-
-            results[self.observator.time.mjd] = {
-                obs_var: np.array(observation[obs_var], dtype=np.float32)
-                for obs_var in observation
-            }
-            results[self.observator.time.mjd]["reward"] = np.array(
-                reward, dtype=np.float32
+            observation, reward, stop, _ = self.step(self._default_action())
+
+            observation["reward"] = reward
+            results.append(
+                observation["mjd"],
+                {
+                    name: self._site_values(observation[name])
+                    for name in results.variables
+                },
             )
 
-            # TODO checkpoint functionality
+            if (checkpoint_path is not None) and (
+                stop or len(results) % self.checkpoint_config["every"] == 0
+            ):
+                self.checkpoint(checkpoint_path, results, stopped=bool(stop))
 
         return results
+
+    def _state(self):
+        """Everything the next step depends on, as json types"""
+        location = self.observator.location
+        return {
+            "time": float(self.time),
+            "timestep": int(self.timestep),
+            "mjd": np.ravel(self.observator.mjd).tolist(),
+            "mjd_shape": list(np.shape(self.observator.mjd)),
+            "paired": self.observator.paired,
+            "default_locations": location is self.observator.default_locations,
+            "ra": np.ravel(location.ra.deg).tolist(),
+            "decl": np.ravel(location.dec.deg).tolist(),
+            "band": self.observator.band,
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def _restore_state(self, state):
+        self.time = state["time"]
+        self.timestep = state["timestep"]
+        self.rng.bit_generator.state = state["rng"]
+
+        mjd = np.reshape(state["mjd"], state["mjd_shape"])
+        if state["default_locations"]:
+            self._point_at_defaults(mjd, state["band"], paired=state["paired"])
+        else:
+            self.observator.update(
+                time=mjd,
+                location={"ra": state["ra"], "decl": state["decl"]},
+                band=state["band"],
+                delay=False,
+                paired=state["paired"],
+            )
+
+    def _checkpoint_chunk(self, path, name, length, save, extension):
+        """
+        Save the rows of a record that grows with the run (e.g. the results) added since the last checkpoint.
+        save(file path, start, end) writes rows [start, end) to "<name>_<start>_<end>.<extension>" in the checkpoint directory.
+        """
+        start = self._checkpointed.get(name, 0)
+        files = self._checkpoint_files.setdefault(name, [])
+        if length > start:
+            file = f"{name}_{start:09d}_{length:09d}.{extension}"
+            save(f"{path}/{file}", start, length)
+            files.append(file)
+        self._checkpointed[name] = length
+
+    def _checkpoint_tail(self, path):
+        """Save anything else that grows with the run with Survey._checkpoint_chunk"""
+        pass
+
+    def _resume_tail(self, path, files):
+        """Load what Survey._checkpoint_tail saved, from the checkpoint files of each record"""
+        pass
+
+    def checkpoint(self, path: str, results: SurveyResults, stopped: bool = False):
+        """
+        Save the steps added to results since the last checkpoint, and the state needed to continue the run with Survey.resume.
+
+        New steps go to their own file ("results_<first step>_<last step>.npz"), so earlier steps are never rewritten.
+        "state.json" (the time, timestep, pointing, band, random generator state and the list of files) is then replaced in one operation,
+        so a run stopped while checkpointing resumes from the previous checkpoint.
+
+        Args:
+            path (str): Directory of the checkpoint
+            results (SurveyResults): Results of the run so far
+            stopped (bool, optional): If the run has met its stopping condition. Defaults to False.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        def save_results(file, start, end):
+            np.savez(
+                file, **{name: results[name][start:end] for name in results.keys()}
+            )
+
+        self._checkpoint_chunk(path, "results", len(results), save_results, "npz")
+        self._checkpoint_tail(path)
+
+        state = self._state()
+        state["checkpointed"] = self._checkpointed
+        state["files"] = self._checkpoint_files
+        state["stopped"] = stopped
+
+        state_path = f"{path}/state.json"
+        with open(f"{state_path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{state_path}.tmp", state_path)
+
+    def resume(self, path: str):
+        """
+        Continue a run from its last checkpoint (written by Survey.__call__ with survey_config["checkpoint"]["path"] set) until the stopping condition is met.
+        The survey must be created with the same configurations as the checkpointed run; the remaining steps are identical to the ones the run would have taken.
+        The rest of the run is checkpointed to path (not survey_config["checkpoint"]["path"]), so it can be resumed again from there.
+
+        Args:
+            path (str): Directory of the checkpoint
+
+        Returns:
+            SurveyResults: Evaluated survey, including the steps from before the checkpoint
+        """
+        with open(f"{path}/state.json", "r") as f:
+            state = json.load(f)
+
+        self._restore_state(state)
+        self._checkpointed = state["checkpointed"]
+        self._checkpoint_files = state["files"]
+        self._resume_tail(path, self._checkpoint_files)
+
+        results = SurveyResults(
+            self.variables + ["valid", "reward"],
+            n_sites=len(self.observator.default_locations),
+            capacity=self.stop_config["timestep"],
+        )
+        for file in self._checkpoint_files["results"]:
+            with np.load(f"{path}/{file}") as columns:
+                results.extend(dict(columns))
+
+        if state["stopped"]:
+            return results
+        return self._run(results, path)
@@ -0,0 +1,122 @@
+import numpy as np
+
+from DeepSurveySim.Survey.coordinates import AltAzRotation
+
+
+class SkyTessellation:
+    """
+    Equal area grid of pointings covering the whole sky, following the HEALPix ring scheme (Gorski et al. 2005, ApJ 622, 759).
+
+    The sky is split into 12 * nside^2 pixels of identical area, arranged on 4 * nside - 1 rings of constant declination.
+    Pixels are numbered from the north pole down, and by increasing right ascension within each ring.
+    Positions, cartesian unit vectors, neighbours and area weights are computed once on creation,
+    so separations and altitudes of every pixel can be taken as dot products against the unit vectors.
+
+    Args:
+        nside (int): Resolution of the grid. Any positive integer.
+
+    Examples:
+        >>> grid = SkyTessellation(nside=16)
+            grid.n_pixels  # 3072
+            grid.pixel_area  # 13.4 square degrees
+            neighbours = grid.neighbours[0]  # pixel indices, -1 padded
+    """
+
+    def __init__(self, nside: int) -> None:
+        assert int(nside) == nside and nside > 0, "nside must be a positive integer"
+
+        self.nside = int(nside)
+        self.n_pixels = 12 * self.nside**2
+        self.n_rings = 4 * self.nside - 1
+
+        self.ring, z, self.phi = self._pixel_rings()
+        self.ra = np.degrees(self.phi)
+        self.decl = np.degrees(np.arcsin(z))
+        self.unit_vectors = AltAzRotation.unit_vectors(self.phi, np.arcsin(z), axis=-1)
+
+        self.ring_count = np.bincount(self.ring, minlength=self.n_rings + 2)
+        self.ring_start = np.concatenate([[0], np.cumsum(self.ring_count)[:-1]])
+        self.neighbours = self._neighbours()
+
+        self.pixel_area = np.degrees(1) ** 2 * 4 * np.pi / self.n_pixels
+        self.area_weights = np.full(self.n_pixels, 1 / self.n_pixels)
+
+    def __len__(self):
+        return self.n_pixels
+
+    def _pixel_rings(self):
+        """Ring number (1 to 4 nside - 1), z = sin(decl), and right ascension (radians) of each pixel center"""
+        nside = self.nside
+        pixels = np.arange(self.n_pixels)
+        n_cap = 2 * nside * (nside - 1)
+
+        ring = np.empty(self.n_pixels, dtype=int)
+        z = np.empty(self.n_pixels)
+        phi = np.empty(self.n_pixels)
+
+        # Polar caps: ring i has 4i pixels
+        north = pixels < n_cap
+        index = pixels[north]
+        i = np.floor((1 + np.sqrt(1 + 2 * index)) / 2).astype(int)
+        j = index - 2 * i * (i - 1)
+        ring[north] = i
+        z[north] = 1 - i**2 / (3 * nside**2)
+        phi[north] = (j + 0.5) * np.pi / (2 * i)
+
+        south = pixels >= self.n_pixels - n_cap
+        index = pixels[south]
+        i = np.floor((1 + np.sqrt(1 + 2 * (self.n_pixels - 1 - index))) / 2).astype(int)
+        j = index - (self.n_pixels - 2 * i * (i + 1))
+        ring[south] = 4 * nside - i
+        z[south] = -(1 - i**2 / (3 * nside**2))
+        phi[south] = (j + 0.5) * np.pi / (2 * i)
+
+        # Equatorial belt: every ring has 4 nside pixels, alternate rings shifted by half a pixel
+        belt = ~(north | south)
+        index = pixels[belt] - n_cap
+        i = index // (4 * nside) + nside
+        j = index % (4 * nside)
+        shift = (i - nside + 1) % 2
+        ring[belt] = i
+        z[belt] = 4 / 3 - 2 * i / (3 * nside)
+        phi[belt] = (j + 1 - shift / 2) * np.pi / (2 * nside)
+
+        return ring, z, phi
+
+    def _neighbours(self):
+        """
+        Pixels on either side in the same ring, and pixels in the rings above and below with an overlapping right ascension range.
+        Returns an (n pixels, max neighbours) array padded with -1
+        """
+        pixels = np.arange(self.n_pixels)
+        count = self.ring_count[self.ring]
+        start = self.ring_start[self.ring]
+
+        position = (pixels - start)[:, np.newaxis] + [-1, 1]
+        columns = [start[:, np.newaxis] + position % count[:, np.newaxis]]
+
+        for step in (-1, 1):
+            adjacent = self.ring + step
+            exists = (adjacent >= 1) & (adjacent <= self.n_rings)
+            adjacent = np.clip(adjacent, 1, self.n_rings)
+            adjacent_count = self.ring_count[adjacent]
+
+            nearest = np.floor(self.phi * adjacent_count / (2 * np.pi)).astype(int)
+            candidates = (nearest[:, np.newaxis] + np.arange(-2, 3)) % adjacent_count[
+                :, np.newaxis
+            ]
+            candidates = self.ring_start[adjacent][:, np.newaxis] + candidates
+
+            separation = np.abs(
+                (self.phi[candidates] - self.phi[:, np.newaxis] + np.pi) % (2 * np.pi)
+                - np.pi
+            )
+            half_widths = np.pi / count + np.pi / adjacent_count
+            overlap = separation < (half_widths - 1e-9)[:, np.newaxis]
+            columns.append(np.where(overlap & exists[:, np.newaxis], candidates, -1))
+
+        neighbours = np.sort(np.concatenate(columns, axis=1), axis=1)
+        # Small rings wrap the candidate window around onto the same pixel more than once
+        neighbours[:, 1:][neighbours[:, 1:] == neighbours[:, :-1]] = -1
+        neighbours = -np.sort(-neighbours, axis=1)
+        return neighbours[:, : np.max(np.sum(neighbours >= 0, axis=1))]
@@ -0,0 +1,257 @@
+import numpy as np
+
+from DeepSurveySim.Survey.survey import Survey
+from DeepSurveySim.Survey.results import SurveyResults
+from DeepSurveySim.Survey.coordinates import AltAzRotation
+
+
+class VectorSurvey(Survey):
+    """
+    Step many independent copies of a Survey at once, as one batched environment.
+
+    Every member keeps its own time, pointing, band, timestep and stop flag, held as arrays with one row per member.
+    Each step is a single ObservationVariables calculation (one per band in use, if members use different bands)
+    over the distinct pointings and observation times of all members, and each member's values are gathered from it (Survey._observe).
+    Members pointed at the same sites (e.g. the default locations) share the work.
+    Members that meet the stopping condition are returned to a new start time, the default locations and the initial band
+    once their final step has been returned; the other members are left as they are.
+    Members can so point at different numbers of sites (e.g. one site each, next to a member reset to the default locations).
+    Pointings are then padded to the widest member, with VectorSurvey.site_mask marking each member's own sites,
+    and the padded sites of an observation are nan (and not valid).
+
+    Observations, rewards and stops are stacked along a leading member axis, the layout of gym vector environments.
+
+    Args:
+        obseravtory_config (dict): Setup parameters for Survey.ObservationVariables, the telescope configuration, as read by IO.ReadConfig
+        survey_config (dict): Parameters for the survey, including the stopping conditions, the validity conditions, the variables to collect, as read by IO.ReadConfig
+        n_envs (int): Number of surveys to run together
+
+    Examples:
+        >>> surveys = VectorSurvey(observatory_config, survey_config, n_envs=64)
+            # One pointing (ra, decl shape (64,)) or n sites (shape (64, n sites)) per member
+            action = {"location": {"ra": ra, "decl": decl}, "band": "g"}
+            observation, reward, stop, log = surveys.step(action)  # observation["airmass"] shape (64, n sites)
+    """
+
+    def __init__(
+        self,
+        observatory_config: dict,
+        survey_config: dict,
+        n_envs: int,
+    ) -> None:
+        self.n_envs = n_envs
+        super().__init__(observatory_config, survey_config)
+        self.reset()
+
+    def _start_time(self):
+        if self.start_time == "random":
+            return self.rng.integers(low=55000, high=70000, size=self.n_envs).astype(
+                float
+            )
+        else:
+            return np.full(self.n_envs, self.start_time, dtype=float)
+
+    def _per_member(self, value):
+        """Broadcast an ra or decl action to (n envs, n sites); scalars and (n envs,) arrays are one site per member"""
+        value = np.asarray(value, dtype=float)
+        if value.ndim < 2:
+            value = value.reshape(-1, 1)
+        return np.broadcast_to(value, (self.n_envs, value.shape[1]))
+
+    def _default_action(self):
+        """Action that moves every member to the default locations"""
+        return {
+            "location": {
+                "ra": self.observator.default_locations.ra.deg[np.newaxis],
+                "decl": self.observator.default_locations.dec.deg[np.newaxis],
+            }
+        }
+
+    def _pad_sites(self, width):
+        """Widen the pointings to at least width sites, with the added sites masked out"""
+        padding = max(width - self.ra.shape[1], 0)
+        if padding:
+            pad = ((0, 0), (0, padding))
+            self.ra = np.pad(self.ra, pad)
+            self.decl = np.pad(self.decl, pad)
+            self.site_mask = np.pad(self.site_mask, pad)
+
+    def _reset_members(self, members):
+        """Return the selected members (boolean mask, shape (n envs,)) to a new start time, the default locations and the initial band"""
+        self.time = np.where(members, self._start_time(), self.time)
+        self.timestep = np.where(members, 0, self.timestep)
+        self.band = np.where(members, self.initial_band, self.band)
+        if not np.any(members):
+            return
+
+        default_ra = self.observator.default_locations.ra.deg
+        default_decl = self.observator.default_locations.dec.deg
+        n_default = len(default_ra)
+
+        # Members keep their own number of sites, so pointings are padded to the widest member
+        self._pad_sites(n_default)
+        width = self.ra.shape[1]
+        self.ra, self.decl = self.ra.copy(), self.decl.copy()
+        self.ra[members, :n_default] = default_ra
+        self.decl[members, :n_default] = default_decl
+        self.site_mask = self.site_mask.copy()
+        self.site_mask[members] = np.arange(width) < n_default
+
+        width = np.max(np.sum(self.site_mask, axis=1))
+        self.ra, self.decl = self.ra[:, :width], self.decl[:, :width]
+        self.site_mask = self.site_mask[:, :width]
+
+    def reset(self):
+        """Return every member to a new start time, the default locations and the initial band, with the timestep at 0."""
+        self.time = self._start_time()
+        self.timestep = np.zeros(self.n_envs, dtype=int)
+        self.band = np.full(self.n_envs, self.initial_band, dtype=object)
+        self.ra = self._per_member(self.observator.default_locations.ra.deg[np.newaxis])
+        self.decl = self._per_member(
+            self.observator.default_locations.dec.deg[np.newaxis]
+        )
+        self.site_mask = np.ones(self.ra.shape, dtype=bool)
+
+    def _delays(self, ra, decl, band, moved):
+        """Slew, filter change and readout time (days) of each member and site, following ObservationVariables.update"""
+        dtype = self.observator.dtype
+        current = AltAzRotation.unit_vectors(
+            np.radians(self.ra), np.radians(self.decl), axis=-1
+        ).astype(dtype)
+        new = AltAzRotation.unit_vectors(
+            np.radians(ra), np.radians(decl), axis=-1
+        ).astype(dtype)
+
+        # Members with as many sites as the new pointing slew site to site, the rest from the centre of their pointing
+        start = np.sum(current * self.site_mask[..., np.newaxis], axis=1, keepdims=True)
+        start /= np.linalg.norm(start, axis=-1, keepdims=True)
+        n_sites = np.sum(self.site_mask, axis=1)
+        start = np.where(
+            (n_sites == 1)[:, np.newaxis, np.newaxis], current[:, :1], start
+        )
+        if current.shape[1] == new.shape[1]:
+            paired = n_sites == new.shape[1]
+            start = np.where(paired[:, np.newaxis, np.newaxis], current, start)
+        seperation = AltAzRotation.seperation(start, new)
+        if not moved:
+            seperation = np.zeros_like(seperation)
+        return self.observator._delay_days(
+            seperation, (band != self.band)[:, np.newaxis]
+        )
+
+    def _stop_condition(self, observation):
+        """Returns true for each member that has met the stopping condition, shape (n envs,)"""
+        conditions = np.broadcast_to(
+            self._stop_conditions(observation),
+            (self.n_envs,) + np.shape(observation["valid"])[1:],
+        )
+        return (self.timestep >= self.stop_config["timestep"]) | np.any(
+            conditions.reshape(self.n_envs, -1), axis=1
+        )
+
+    def step(self, action: dict):
+        """
+        Move every member forward with its own action, add the reward and stop condition, and reset the members that stopped.
+
+        Args:
+            action (dict): Dictionary containing "time" (Mean Julian Date, scalar or shape (n envs,)) (optional, defaults to each member's current time), "location" (dict with ra, decl, in degrees, shape (n envs,) or (n envs, n sites)) (optional), "band" (str, or one per member) (optional)
+
+        Returns:
+            Tuple : observation (dict, containing survey_config["variables"] and validity, shape (n envs, n sites), and "mjd", shape (n envs,)), reward (array, shape (n envs, n sites)), stop (array, shape (n envs,)), log (dictionary, "reset" marks the members that were reset after this step)
+        """
+        time = np.broadcast_to(
+            np.asarray(action.get("time", self.time), dtype=float), (self.n_envs,)
+        )
+        band = self.band
+        if action.get("band") is not None:
+            band = np.broadcast_to(
+                np.asarray(action["band"], dtype=object), (self.n_envs,)
+            )
+
+        if action.get("location") is not None:
+            ra, decl = self.observator._nudge(
+                self._per_member(action["location"]["ra"]),
+                self._per_member(action["location"]["decl"]),
+                self._mean_pointing(self.ra),
+                self._mean_pointing(self.decl),
+            )
+            ra, decl = np.broadcast_arrays(ra, decl)
+            delay = self._delays(ra, decl, band, moved=True)
+            site_mask = np.ones(ra.shape, dtype=bool)
+        else:
+            ra, decl, site_mask = self.ra, self.decl, self.site_mask
+            delay = (
+                self._delays(ra, decl, band, moved=False)
+                if action.get("band") is not None
+                else np.zeros((self.n_envs, 1))
+            )
+
+        mjd = np.broadcast_to(time[:, np.newaxis] + delay, ra.shape)
+        member_band = np.broadcast_to(np.asarray(band)[:, np.newaxis], mjd.shape)
+
+        # Only each member's own sites are observed, padded sites are nan (and not valid)
+        values = self._observe(
+            mjd[site_mask], ra[site_mask], decl[site_mask], member_band[site_mask]
+        )
+        observation = {}
+        for name, value in values.items():
+            observation[name] = np.full(
+                mjd.shape, False if value.dtype == bool else np.nan, dtype=value.dtype
+            )
+            observation[name][site_mask] = value
+        observation["valid"] = self._validity(observation) & observation.pop(
+            "moon_valid"
+        )
+
+        self.time = np.nanmean(np.where(site_mask, mjd, np.nan), axis=1)
+        self.ra, self.decl, self.site_mask = ra, decl, site_mask
+        self.band = np.array(band, dtype=object)
+        observation["mjd"] = self.time.copy()
+
+        reward = np.where(site_mask, self._reward(observation), np.nan)
+        self.timestep = self.timestep + 1
+        stop = self._stop_condition({**observation, "reward": reward})
+
+        log = {"reset": stop}
+        self._reset_members(stop)
+
+        return observation, reward, stop, log
+
+    def _mean_pointing(self, value):
+        """Mean ra or decl of each member's own sites, shape (n envs, 1)"""
+        return np.sum(value * self.site_mask, axis=1, keepdims=True) / np.sum(
+            self.site_mask, axis=1, keepdims=True
+        )
+
+    def __call__(self):
+        """
+        Run one episode of every member on the default locations, until each member has met the stopping condition once.
+        Steps a member takes after its episode stopped (from its new start time) are not recorded.
+
+        Returns:
+            list[SurveyResults]: Evaluated survey of each member, with survey_config["variables"], "valid" and "reward" each of shape (n steps, n sites), and "mjd", shape (n steps,)
+        """
+        n_sites = len(self.observator.default_locations)
+        results = [
+            SurveyResults(
+                self.variables + ["valid", "reward"],
+                n_sites=n_sites,
+                capacity=self.stop_config["timestep"] - self.timestep[member],
+            )
+            for member in range(self.n_envs)
+        ]
+
+        running = np.ones(self.n_envs, dtype=bool)
+        while np.any(running):
+            observation, reward, stop, _ = self.step(self._default_action())
+            observation["reward"] = reward
+            for member in np.flatnonzero(running):
+                results[member].append(
+                    observation["mjd"][member],
+                    {
+                        name: observation[name][member]
+                        for name in results[member].variables
+                    },
+                )
+            running &= ~stop
+        return results
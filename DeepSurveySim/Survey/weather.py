@@ -1,5 +1,5 @@
+import numpy as np
 import pandas as pd
-from astropy.time import Time
 
 
 class Weather:
@@ -42,6 +42,7 @@ class Weather:
             [self.seeing_name, self.date_name]
         ]
         self._format_source(csv_configuration)
+        self.clear_fraction = self._daily_clear_fraction()
 
     def _default_configuration(self):
         return {
@@ -64,12 +65,63 @@ class Weather:
             self.weather_source[self.date_name], infer_datetime_format=True
         )
 
+    def _daily_clear_fraction(self):
+        # Fraction of clear records for every (month, day), using the day and the two after it in the same month, as in Weather.condition
+        dates = self.weather_source[self.date_name].dt
+        clear = np.zeros((13, 34))
+        records = np.zeros((13, 34))
+        np.add.at(
+            clear,
+            (dates.month.values, dates.day.values),
+            self.weather_source[self.seeing_name].values,
+        )
+        np.add.at(records, (dates.month.values, dates.day.values), 1)
+
+        window_clear = clear[:, 1:32] + clear[:, 2:33] + clear[:, 3:34]
+        window_records = records[:, 1:32] + records[:, 2:33] + records[:, 3:34]
+
+        clear_fraction = np.full((13, 32), np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            clear_fraction[:, 1:] = window_clear / window_records
+        return clear_fraction
+
     def _find_date(self, mjd):
-        date = Time(mjd, format="mjd")
-        month = date.datetime.month
-        day = date.datetime.day
+        mjd = np.asarray(mjd, dtype=float)
+        date = pd.DatetimeIndex(
+            np.datetime64("1858-11-17")
+            + (mjd.ravel() * 86400e6).astype("timedelta64[us]")
+        )
+        month = date.month.values.reshape(mjd.shape)
+        day = date.day.values.reshape(mjd.shape)
+        if mjd.ndim == 0:
+            return int(month), int(day)
         return month, day
 
+    def __call__(self, mjd):
+        """
+        Seeing and clouds for an array of times, following the same rules as Weather.seeing and Weather.clouds applied to Weather.condition
+
+        Args:
+            mjd (Union(float, array)): Dates in MJD
+
+        Returns:
+            tuple: seeing, clouds; each the shape of mjd
+        """
+        month, day = self._find_date(mjd)
+        cloud_condition = 1 - self.clear_fraction[month, day]
+
+        seeing = np.where(
+            cloud_condition >= self.seeing_tolerance,
+            self.reference_seeing * (1 - np.round(cloud_condition, 1)),
+            self.reference_seeing,
+        )
+        clouds = np.where(
+            cloud_condition >= self.clouds_tolerance, 1.0, self.reference_clouds
+        )
+        if np.ndim(mjd) == 0:
+            return float(seeing), float(clouds)
+        return seeing, clouds
+
     def condition(self, mjd):
         """
         Return the sky conditions for all data with the same month as the supplied mjd.
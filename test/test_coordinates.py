@@ -0,0 +1,114 @@
+import pytest
+import numpy as np
+import astropy
+
+from DeepSurveySim.Survey import AltAzRotation, ObservationVariables
+from DeepSurveySim.Survey.coordinates import local_mean_sidereal_time
+from DeepSurveySim.IO import ReadConfig
+
+
+@pytest.fixture
+def site():
+    return astropy.coordinates.EarthLocation.from_geodetic(
+        lon=-122.504 * astropy.units.deg, lat=38.28869 * astropy.units.deg
+    )
+
+
+@pytest.fixture
+def times():
+    mjd = np.random.default_rng().uniform(low=55000, high=61000, size=3)
+    return astropy.time.Time(mjd, format="mjd")
+
+
+def test_sites_match_astropy(site, times):
+    rng = np.random.default_rng()
+    ra = rng.uniform(0, 360, 500)
+    decl = np.degrees(np.arcsin(rng.uniform(-1, 1, 500)))
+
+    vectors = AltAzRotation.unit_vectors(np.radians(ra), np.radians(decl), axis=-1)
+    alt, az = AltAzRotation(site, times).sites(vectors)
+    assert alt.shape == (500, 3)
+
+    frame = astropy.coordinates.AltAz(obstime=times, location=site)
+    expected = astropy.coordinates.SkyCoord(ra=ra, dec=decl, unit="deg")
+    expected = expected.reshape(-1, 1).transform_to(frame)
+    result = astropy.coordinates.SkyCoord(az=az, alt=alt, unit="deg", frame=frame)
+
+    assert result.separation(expected).arcsec.max() < 1
+
+
+def test_bodies_match_astropy(site, times):
+    rotation = AltAzRotation(site, times)
+    frame = astropy.coordinates.AltAz(obstime=times, location=site)
+
+    for body in [
+        astropy.coordinates.get_sun(times),
+        astropy.coordinates.get_moon(times),
+    ]:
+        alt, az = rotation.bodies(body)
+        expected = body.transform_to(frame)
+        result = astropy.coordinates.SkyCoord(az=az, alt=alt, unit="deg", frame=frame)
+
+        assert result.separation(expected).arcsec.max() < 1
+
+
+def test_rotation_engine_variables():
+    config = ReadConfig()()
+    computed = ObservationVariables(config)
+    config["altaz_engine"] = "rotation"
+    rotated = ObservationVariables(config)
+
+    times = np.array([60000.1, 60000.3])
+    computed.update(times)
+    rotated.update(times)
+
+    for function in [
+        "calculate_observation_angles",
+        "calculate_observation_airmass",
+        "calculate_sun_airmass",
+        "calculate_moon_airmass",
+    ]:
+        expected = getattr(computed, function)()
+        result = getattr(rotated, function)()
+        for key in expected:
+            assert result[key].shape == expected[key].shape
+            assert result[key] == pytest.approx(expected[key], abs=1e-3, nan_ok=True)
+
+
+def test_fast_sidereal_time_matches_astroplan():
+    config = ReadConfig()()
+    fast_config = ReadConfig()()
+    fast_config["sidereal_time"] = "fast"
+    reference = ObservationVariables(config)
+    fast = ObservationVariables(fast_config)
+
+    times = np.random.default_rng().uniform(low=55000, high=61000, size=50)
+    reference.update(times)
+    fast.update(times)
+
+    for variable in ["lst", "ha", "sun_ha", "moon_ha"]:
+        difference = (
+            fast.calculate([variable])[variable]
+            - reference.calculate([variable])[variable]
+            + 180
+        ) % 360 - 180
+        assert np.all(np.abs(difference) < 0.9 / 240)
+
+
+def test_sidereal_time_offsets():
+    observatory = ObservationVariables(ReadConfig()())
+    times = np.random.default_rng().uniform(low=55000, high=61000, size=50)
+    observatory.update(times)
+
+    reference = observatory.calculate(["lst"])["lst"]
+    lst = local_mean_sidereal_time(
+        times,
+        observatory.site.lon.deg,
+        ut1_utc=observatory.ut1_utc(),
+        tt_utc=observatory.tt_utc(),
+    )
+    difference = (lst - reference + 180) % 360 - 180
+    assert np.all(np.abs(difference) < 0.001 / 240)
+
+    tt = astropy.time.Time(times, format="mjd").tt.mjd
+    assert observatory.tt_utc() == pytest.approx((tt - times) * 86400, abs=1e-3)
@@ -1,3 +1,4 @@
+import pandas as pd
 import pytest
 
 from DeepSurveySim.Survey import UniformSurvey, LowVisiblitySurvey
@@ -187,3 +188,17 @@ def test_lowvis_incorrect_sites():
         survey.step(action)
 
     assert survey.cummulative_reward() < expected_reward
+
+
+def test_checkpoint_all_steps(tmp_path):
+    survey_config = ReadConfig(survey=True)()
+    survey_config["stopping"] = {"timestep": 4}
+    survey_config["checkpoint"] = {"path": str(tmp_path), "every": 2}
+    obs_config = ReadConfig(survey=False)()
+    obs_config["location"] = {"ra": [0], "decl": [0]}
+    survey = UniformSurvey(obs_config, survey_config)
+    survey()
+
+    resumed = UniformSurvey(obs_config, survey_config)
+    resumed.resume(str(tmp_path))
+    pd.testing.assert_frame_equal(resumed.all_steps, survey.all_steps)
@@ -0,0 +1,100 @@
+import pytest
+import numpy as np
+import astropy
+import astroplan
+
+from DeepSurveySim.Survey import (
+    AnalyticEphemeris,
+    EphemerisTable,
+    ObservationVariables,
+)
+from DeepSurveySim.IO import ReadConfig
+
+
+@pytest.fixture
+def table(tmp_path):
+    return EphemerisTable(
+        path=f"{tmp_path}/ephemeris.npy", start_mjd=60000, end_mjd=60010
+    )
+
+
+def test_table_saved(table):
+    assert table.table.shape == (241, len(EphemerisTable.columns))
+    assert table.start_mjd == 60000
+    assert table.end_mjd == pytest.approx(60010)
+
+
+def test_table_matches_astropy(table):
+    mjd = np.random.default_rng().uniform(low=60000, high=60010, size=10)
+    positions = table(mjd)
+    time = astropy.time.Time(mjd, format="mjd")
+
+    sun = astropy.coordinates.get_sun(time)
+    moon = astropy.coordinates.get_moon(time)
+    for body, coordinates in (("sun", sun), ("moon", moon)):
+        interpolated = astropy.coordinates.SkyCoord(
+            ra=positions[f"{body}_ra"],
+            dec=positions[f"{body}_decl"],
+            unit="deg",
+            frame="gcrs",
+            obstime=time,
+        )
+        assert interpolated.separation(coordinates).arcsec.max() < 1
+
+    assert positions["moon_ra"].shape == mjd.shape
+
+
+def test_table_out_of_range(table):
+    with pytest.raises(ValueError):
+        table(np.array([59000]))
+
+
+def test_table_observation_variables(table):
+    config = ReadConfig()()
+    config["ephemeris"] = "table"
+    config["ephemeris_table"] = {"path": table.path}
+    interpolated = ObservationVariables(config)
+
+    config["ephemeris"] = "astropy"
+    computed = ObservationVariables(config)
+
+    interpolated.update(time=60005.3)
+    computed.update(time=60005.3)
+
+    for function in ["calculate_moon_location", "calculate_moon_brightness"]:
+        expected = getattr(computed, function)()
+        result = getattr(interpolated, function)()
+        for key in expected:
+            assert result[key] == pytest.approx(expected[key], abs=0.01)
+
+
+def test_analytic_matches_astropy():
+    mjd = np.random.default_rng().uniform(low=55000, high=70000, size=50)
+    positions = AnalyticEphemeris()(mjd)
+    time = astropy.time.Time(mjd, format="mjd")
+
+    sun = astropy.coordinates.get_sun(time)
+    moon = astropy.coordinates.get_moon(time)
+    for body, coordinates in (("sun", sun), ("moon", moon)):
+        analytic = astropy.coordinates.SkyCoord(
+            ra=positions[f"{body}_ra"],
+            dec=positions[f"{body}_decl"],
+            unit="deg",
+            frame="gcrs",
+            obstime=time,
+        )
+        assert analytic.separation(coordinates).arcmin.max() < 2
+
+    expected_phase = astroplan.moon.moon_phase_angle(time).to_value("deg")
+    assert positions["moon_phase"] == pytest.approx(expected_phase, abs=0.1)
+
+
+def test_analytic_observation_variables():
+    config = ReadConfig()()
+    config["ephemeris"] = "fast"
+    SEO = ObservationVariables(config)
+    SEO.update(time=np.array([60005.3, 60005.4]))
+
+    moon = SEO.calculate_moon_brightness()
+    assert moon["moon_illumination"].shape == (10, 2)
+    assert np.all((moon["moon_illumination"] >= 0) & (moon["moon_illumination"] <= 1))
@@ -201,3 +201,321 @@ def test_nudge_small_change():
 
     assert pytest.approx(new_position["ra"] - SEO.location.ra.deg, abs=0.01) == 0
     assert pytest.approx(new_position["decl"] - SEO.location.dec.deg, abs=0.01) == 0
+
+
+def test_ephemeris_cached_per_time(seo_observatory):
+    seo_observatory.update(time=60000)
+    sun = seo_observatory._sun_coordinates()
+    seo_observatory.calculate_sun_airmass()
+    assert seo_observatory._sun_coordinates() is sun
+
+    seo_observatory.update(time=60000)
+    assert seo_observatory._sun_coordinates() is sun
+
+    seo_observatory.update(time=60001)
+    assert seo_observatory._sun_coordinates() is not sun
+
+
+def test_time_only_built_when_needed(seo_observatory):
+    seo_observatory.update(time=[60000.1, 60000.2])
+    assert seo_observatory.mjd.dtype == np.float64
+    assert "time" not in seo_observatory._ephemeris
+
+    seo_observatory.calculate(["airmass", "lst"])
+    time = seo_observatory.time
+    assert isinstance(time, astropy.time.Time)
+    assert np.all(time.mjd == seo_observatory.mjd)
+    assert seo_observatory.time is time
+
+
+def test_site_broadcast_matches_single_sites():
+    config = ReadConfig()()
+    rng = np.random.default_rng()
+    n_sites = 200
+    config["location"] = {
+        "ra": rng.uniform(0, 360, n_sites).tolist(),
+        "decl": rng.uniform(-90, 90, n_sites).tolist(),
+    }
+    SEO = ObservationVariables(config)
+    times = np.array([60000.1, 60000.2, 60000.3])
+    SEO.update(times)
+
+    alt = SEO.calculate_observation_angles()["alt"]
+    airmass = SEO.calculate_observation_airmass()["airmass"]
+    ha = SEO.calculate_observation_ha()["ha"]
+    for variable in (alt, airmass, ha):
+        assert variable.shape == (n_sites, len(times))
+
+    site = SEO.location[7]
+    assert alt[7] == pytest.approx(SEO._alt_az(site)[0])
+    assert ha[7] == pytest.approx(SEO._ha(site))
+
+
+@pytest.mark.parametrize("altaz_engine", ["astropy", "rotation"])
+def test_paired_matches_product(altaz_engine):
+    config = ReadConfig()()
+    config["altaz_engine"] = altaz_engine
+    SEO = ObservationVariables(config)
+    rng = np.random.default_rng(5)
+    location = {"ra": rng.uniform(0, 360, 6), "decl": rng.uniform(-90, 30, 6)}
+    times = 60000.1 + np.linspace(0, 0.01, 6)
+    variables = ["alt", "az", "airmass", "ha", "moon_seperation", "sun_seperation"]
+    variables += ["lst", "moon_airmass", "pt_seeing"]
+
+    SEO.update(times, location=location, delay=False)
+    product = SEO.calculate(variables)
+    SEO.update(times, location=location, delay=False, paired=True)
+    paired = SEO.calculate(variables)
+
+    for name in variables:
+        assert paired[name].shape == (6,)
+        assert np.allclose(paired[name], np.diagonal(product[name]), equal_nan=True)
+
+    with pytest.raises(ValueError):
+        SEO.update(times[:2], location=location, delay=False, paired=True)
+
+
+def test_update_pairs_sites_reached_at_different_times(seo_observatory):
+    location = {"ra": [10.0, 50.0, 200.0], "decl": [0.0, 20.0, -40.0]}
+    seo_observatory.update(60000.1, location=location, delay=False)
+
+    # Staying on the same sites, they are all reached at once
+    seo_observatory.update(60000.2, location=location)
+    assert not seo_observatory.paired
+    assert seo_observatory.mjd.shape == ()
+    assert seo_observatory.calculate(["alt"])["alt"].shape == (3,)
+
+    seo_observatory.update(
+        60000.3, location={"ra": [10.0, 60.0, 10.0], "decl": [0.0, 20.0, 0.0]}
+    )
+    assert seo_observatory.paired
+    assert seo_observatory.mjd.shape == (3,)
+    assert seo_observatory.mjd[0] < seo_observatory.mjd[1]
+    assert seo_observatory.calculate(["alt"])["alt"].shape == (3,)
+
+
+def test_delay_without_band_change():
+    config = ReadConfig(observator_configuration=None)()
+    config["location"] = {"ra": [0], "decl": [0]}
+    config["filter_change_rate"] = 120.0
+    SEO = ObservationVariables(config)
+
+    SEO.update(time=60000, location={"ra": [0], "decl": [10]})
+    expected_seconds = 10 * config["slew_expr"] + config["readout_seconds"]
+    assert SEO.mjd[0] == pytest.approx(60000 + expected_seconds / 86400)
+
+    SEO.update(time=60000, location={"ra": [0], "decl": [20]}, band="r")
+    expected_seconds += 120.0
+    assert SEO.mjd[0] == pytest.approx(60000 + expected_seconds / 86400)
+
+
+def test_name_to_function_without_calculation(seo_observatory):
+    names = seo_observatory.name_to_function()
+
+    assert seo_observatory.time is None
+    assert names["moon_ra"] == seo_observatory.calculate_moon_location
+    assert "sky_magnitude" not in names
+
+
+def test_calculate_shares_functions(seo_observatory, monkeypatch):
+    calls = []
+    calculate_observation_angles = seo_observatory.calculate_observation_angles
+
+    def count_calls():
+        calls.append(1)
+        return calculate_observation_angles()
+
+    monkeypatch.setattr(seo_observatory, "calculate_observation_angles", count_calls)
+    seo_observatory.update(time=60000)
+    results = seo_observatory.calculate(["alt", "az", "airmass", "fwhm"])
+
+    assert len(calls) == 1
+    assert set(results.keys()) == {"alt", "az", "airmass", "fwhm"}
+    assert seo_observatory.required_functions(["fwhm"]) == [
+        "calculate_observation_angles",
+        "calculate_observation_airmass",
+        "calculate_seeing",
+    ]
+
+
+def test_site_invariant_views(seo_observatory):
+    seo_observatory.update(np.array([60000.1, 60000.2]))
+    results = seo_observatory.calculate(seo_observatory.site_invariant_variables)
+
+    for key in seo_observatory.site_invariant_variables:
+        assert results[key].shape == (10, 2)
+        assert results[key].strides[0] == 0
+        assert not results[key].flags.writeable
+
+
+def test_batch_times(seo_observatory):
+    seo_observatory.update(59999.5, band="r")
+    mjd = seo_observatory.mjd
+    before = seo_observatory.calculate(["alt"])["alt"]
+
+    times = np.linspace(60000, 60001, 24)
+    results = seo_observatory.batch(times, ["alt", "airmass", "sun_airmass"])
+
+    assert seo_observatory.mjd is mjd
+    assert seo_observatory.band == "r"
+    assert seo_observatory.calculate(["alt"])["alt"] is before
+
+    for value in results.values():
+        assert value.shape == (10, 24)
+        assert value.flags.c_contiguous
+
+    seo_observatory.update(times[5])
+    single = seo_observatory.calculate(["alt", "airmass", "sun_airmass"])
+    for key, value in single.items():
+        assert np.allclose(results[key][:, 5], np.ravel(value), equal_nan=True)
+
+
+def test_slew_delay():
+    config = ReadConfig(observator_configuration=None)()
+    config["location"] = {"ra": [0], "decl": [0]}
+    SEO = ObservationVariables(config)
+
+    SEO.update(time=60000, location={"ra": [0], "decl": [10]})
+    expected_seconds = 10 * config["slew_expr"] + config["readout_seconds"]
+    assert SEO.time.mjd[0] == pytest.approx(60000 + expected_seconds / 86400)
+
+
+def test_slew_delay_matrix():
+    config = ReadConfig(observator_configuration=None)()
+    config["location"] = {"ra": [0, 90, 0], "decl": [0, 0, 90]}
+    SEO = ObservationVariables(config)
+
+    matrix = SEO.slew_delay_matrix()
+    assert SEO.slew_delay_matrix() is matrix
+    assert matrix.shape == (3, 3)
+    assert np.allclose(np.diag(matrix), config["readout_seconds"])
+    assert np.allclose(
+        matrix[~np.eye(3, dtype=bool)],
+        90 * config["slew_expr"] + config["readout_seconds"],
+    )
+
+    delays = SEO.site_delays(1, band="r")
+    assert delays.shape == (3,)
+    assert delays[1] == pytest.approx(
+        (config["readout_seconds"] + config["filter_change_rate"]) / 86400
+    )
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_site_delays_match_update(dtype):
+    config = ReadConfig(observator_configuration=None)()
+    config["dtype"] = dtype
+    config["location"] = {"ra": [30.0, 30.05], "decl": [-20.0, -20.0]}
+    SEO = ObservationVariables(config)
+    delays = SEO.site_delays(0)
+
+    SEO.update(60000, location={"ra": [30.0], "decl": [-20.0]}, delay=False)
+    SEO.update(60000, location={"ra": [30.05], "decl": [-20.0]})
+    assert delays[1] == pytest.approx(SEO.mjd - 60000, rel=1e-6)
+
+
+def test_sky_magnitude_single_call(seo_observatory):
+    calls = []
+
+    class MoonSkyModel:
+        m_zen = {"g": 22.0}
+
+        def __call__(self, mjd, ra, decl, band, moon_crds, moon_elongation, sun_crds):
+            calls.append(mjd)
+            assert len(ra) == len(mjd) == len(moon_crds) == len(moon_elongation)
+            return np.full(len(mjd), 21.0)
+
+    seo_observatory.skybright = MoonSkyModel()
+    seo_observatory.update(np.array([60000.1, 60000.2, 60000.3]))
+    results = seo_observatory.calculate(["sky_magnitude", "tau", "teff"])
+
+    assert len(calls) == 1
+    assert len(calls[0]) == 10 * 3
+    assert results["sky_magnitude"].shape == (10, 3)
+    assert results["tau"].shape == (10, 3)
+
+
+def test_float32_variables():
+    config = ReadConfig(observator_configuration=None)()
+    config["dtype"] = "float32"
+    single = ObservationVariables(config)
+    double = ObservationVariables(ReadConfig(observator_configuration=None)())
+
+    times = np.array([60000.1, 60000.2, 60000.3])
+    single.update(times)
+    double.update(times)
+    variables = list(single.name_to_function().keys())
+    single_results = single.calculate(variables)
+    double_results = double.calculate(variables)
+
+    for name in variables:
+        assert single_results[name].dtype == np.float32
+        assert double_results[name].dtype == np.float64
+        assert np.allclose(
+            single_results[name], double_results[name], rtol=1e-5, equal_nan=True
+        )
+
+    assert single._airmass(np.array([30.0, 60.0])).dtype == np.float32
+    assert single.slew_delay_matrix().dtype == np.float32
+
+    single.update(60000.1, location={"ra": [10.0], "decl": [-5.0]})
+    double.update(60000.1, location={"ra": [10.0], "decl": [-5.0]})
+    assert single.mjd.dtype == np.float64
+    assert single.mjd == pytest.approx(double.mjd, rel=0, abs=1e-9)
+
+
+def test_seperation_matches_astropy(seo_observatory):
+    seo_observatory.update(np.array([60000.1, 60010.2]))
+    results = seo_observatory.calculate(["moon_seperation", "sun_seperation"])
+
+    for body, coordinates in (
+        ("moon", seo_observatory._moon_coordinates()),
+        ("sun", seo_observatory._sun_coordinates()),
+    ):
+        expected = np.asarray(
+            [
+                coordinates.separation(location).deg
+                for location in seo_observatory.location
+            ]
+        )
+        assert results[f"{body}_seperation"].shape == (10, 2)
+        assert np.allclose(results[f"{body}_seperation"], expected, atol=0.01)
+
+    assert np.array_equal(
+        seo_observatory.moon_angle_valid(),
+        results["moon_seperation"] >= seo_observatory.min_moon_angle,
+    )
+
+
+def test_conditions_chain(seo_observatory):
+    class MoonSkyModel:
+        m_zen = {"g": 22.3}
+
+        def __call__(self, mjd, ra, decl, band, moon_crds, moon_elongation, sun_crds):
+            return 20 + np.cos(np.radians(ra))
+
+    seo_observatory.skybright = MoonSkyModel()
+    seo_observatory.update(np.array([60000.1, 60000.2]))
+    seo_observatory.clouds = np.array([0.2, 0.0])
+    results = seo_observatory.calculate(
+        ["alt", "airmass", "pt_seeing", "band_seeing", "fwhm", "sky_magnitude", "tau"]
+    )
+
+    cos_zd = np.sin(np.radians(results["alt"]))
+    a = 462.46 + 2.8121 / (cos_zd**2 + 0.22 * cos_zd + 0.01)
+    airmass = np.sqrt((a * cos_zd) ** 2 + 2 * a + 1) - a * cos_zd
+    airmass[results["alt"] < 0] = np.nan
+    pt_seeing = 0.9 * airmass**0.6
+    band_seeing = pt_seeing * (500.0 / 475.0) ** 0.2
+    fwhm = np.sqrt(band_seeing**2 + 0.45**2)
+    nu = 10 ** (-seo_observatory.clouds / 2.5)
+    tau = (nu * 0.9 / fwhm) ** 2 * 10 ** ((results["sky_magnitude"] - 22.3) / 2.5)
+
+    for name, expected in (
+        ("airmass", airmass),
+        ("pt_seeing", pt_seeing),
+        ("band_seeing", band_seeing),
+        ("fwhm", fwhm),
+        ("tau", tau),
+    ):
+        assert np.allclose(results[name], expected, equal_nan=True)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from DeepSurveySim.Survey import SurveyResults
+
+
+def test_append():
+    results = SurveyResults(["airmass", "valid"], n_sites=3, capacity=2)
+    results.append(60000.1, {"airmass": [1.0, 2.0, 3.0], "valid": [True, False, True]})
+
+    assert len(results) == 1
+    assert results["airmass"].shape == (1, 3)
+    assert results["airmass"].dtype == np.float32
+    assert results["valid"].dtype == np.bool_
+    assert results["mjd"].tolist() == [60000.1]
+
+
+def test_grow():
+    results = SurveyResults(["airmass"], n_sites=2, capacity=2)
+    for step in range(5):
+        results.append(60000 + step, {"airmass": [step, step]})
+
+    assert results.capacity == 8
+    assert len(results) == 5
+    assert results["airmass"][:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert results["mjd"].tolist() == [60000, 60001, 60002, 60003, 60004]
+
+
+def test_to_dict():
+    results = SurveyResults(["airmass"], n_sites=2)
+    results.append(60000.5, {"airmass": [1.0, 2.0]})
+    results.append(60001.5, {"airmass": [3.0, 4.0]})
+
+    nested = results.to_dict()
+    assert list(nested.keys()) == [60000.5, 60001.5]
+    assert nested[60001.5]["airmass"].tolist() == [3.0, 4.0]
@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+
+from DeepSurveySim.Survey import Survey, SurveyRollouts
+from DeepSurveySim.IO import ReadConfig
+
+
+@pytest.fixture
+def configs():
+    survey_config = ReadConfig(survey=True)()
+    survey_config["stopping"] = {"timestep": 3}
+    return ReadConfig()(), survey_config
+
+
+def single_site(survey, observation):
+    return {"location": {"ra": [survey.rng.uniform(0, 360)], "decl": [-10.0]}}
+
+
+def test_shapes(configs):
+    results = SurveyRollouts(*configs, n_workers=2)(n_episodes=5, seed=1)
+
+    n_sites = len(Survey(*configs).observator.default_locations)
+    for variable in configs[1]["variables"] + ["valid", "reward"]:
+        assert results[variable].shape == (5, 3, n_sites)
+    assert results["mjd"].shape == (5, 3)
+    assert np.all(results["length"] == 3)
+    assert not np.any(np.isnan(results["mjd"]))
+
+
+@pytest.mark.parametrize(
+    "rollout_config",
+    [{}, {"policy": single_site, "n_sites": 1}],
+    ids=["default", "policy"],
+)
+def test_seeded(configs, rollout_config):
+    first = SurveyRollouts(*configs, n_workers=2, **rollout_config)(
+        n_episodes=4, seed=7
+    )
+    second = SurveyRollouts(*configs, n_workers=1, **rollout_config)(
+        n_episodes=4, seed=7
+    )
+    other = SurveyRollouts(*configs, n_workers=2, **rollout_config)(
+        n_episodes=4, seed=8
+    )
+
+    for name in first:
+        assert np.array_equal(first[name], second[name], equal_nan=True)
+    assert not np.array_equal(first["mjd"], other["mjd"])
+
+
+def test_matches_survey(configs):
+    results = SurveyRollouts(*configs, n_workers=1)(n_episodes=1, seed=3)
+
+    survey = Survey(*configs)
+    survey.rng = np.random.default_rng(np.random.SeedSequence(3).spawn(1)[0])
+    survey.reset()
+    for step in range(3):
+        observation, reward, _, _ = survey.step(survey._default_action())
+        assert results["mjd"][0, step] == observation["mjd"]
+        assert np.array_equal(
+            results["airmass"][0, step],
+            survey._site_values(observation["airmass"]),
+            equal_nan=True,
+        )
+
+
+def test_policy(configs):
+    results = SurveyRollouts(*configs, n_workers=2, policy=single_site, n_sites=1)(
+        n_episodes=2, seed=0
+    )
+    assert results["airmass"].shape == (2, 3, 1)
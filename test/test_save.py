@@ -1,6 +1,7 @@
 from DeepSurveySim.IO.save_simulation import SaveSimulation
 from DeepSurveySim.IO.read_config import ReadConfig
 from DeepSurveySim.Survey.survey import Survey
+from DeepSurveySim.Survey.results import SurveyResults
 
 import pytest
 import os
@@ -68,3 +69,38 @@ def test_id_random():
     id_2 = SaveSimulation._generate_run_id()
 
     assert id_1 != id_2
+
+
+def test_save_site_invariant_once(default_survey):
+    sample_results = {}
+
+    sample_results[default_survey.observator.time.mjd] = {
+        "airmass": np.array([1.0, 10.0, 100.0], dtype=np.float32),
+        "lst": np.broadcast_to(np.array(20.0, dtype=np.float32), (3,)),
+    }
+
+    saver = SaveSimulation(default_survey, sample_results)
+    saver.save_results()
+
+    with open(f"{saver.save_path}/survey_results.json", "r") as f:
+        saved_results = json.load(f)
+
+    saved_step = list(saved_results.values())[0]
+    assert saved_step["airmass"] == [1.0, 10.0, 100.0]
+    assert saved_step["lst"] == [20.0]
+
+
+def test_save_survey_results(default_survey):
+    results = SurveyResults(["airmass", "valid"], n_sites=2)
+    results.append(60000.5, {"airmass": [1.0, 2.0], "valid": [True, False]})
+    results.append(60001.5, {"airmass": [3.0, 4.0], "valid": [False, False]})
+
+    saver = SaveSimulation(default_survey, results)
+    saver.save_results()
+
+    with open(f"{saver.save_path}/survey_results.json", "r") as f:
+        saved_results = json.load(f)
+
+    assert list(saved_results.keys()) == ["60000.5", "60001.5"]
+    assert saved_results["60000.5"]["airmass"] == [1.0, 2.0]
+    assert saved_results["60000.5"]["valid"] == [True, False]
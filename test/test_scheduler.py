@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+
+from DeepSurveySim.Survey import Survey, GreedyScheduler
+from DeepSurveySim.IO import ReadConfig
+
+
+@pytest.fixture
+def survey():
+    survey_config = ReadConfig(survey=True)()
+    survey_config["start_time"] = 59900.2
+    survey_config["stopping"] = {"timestep": 5}
+    survey = Survey(ReadConfig()(), survey_config)
+    survey.reset()
+    return survey
+
+
+def test_scores_leave_survey_unchanged(survey):
+    scheduler = GreedyScheduler(survey, bands=["g", "r"])
+    state = survey._state()
+
+    scores = scheduler.scores()
+    assert scores.shape == (2, len(survey.observator.default_locations))
+    assert survey._state() == state
+
+
+def test_overhead_lowers_scores(survey):
+    survey.observator.band_change_rate = 120.0
+    free = GreedyScheduler(survey, bands=["g", "r"], overhead_cost=0).scores()
+    costed = GreedyScheduler(survey, bands=["g", "r"], overhead_cost=1).scores()
+    assert np.all(costed < free)
+    # The filter change is charged to every band but the current one
+    assert np.all((free - costed)[1] > (free - costed)[0])
+
+
+def test_run(survey):
+    scheduler = GreedyScheduler(survey, bands=["g", "r"])
+    first_action, _, _ = scheduler.action()
+
+    results = scheduler()
+    assert len(results) == 5
+    assert results["reward"].shape == (5, 1)
+    assert np.all(np.isin(results["band"], [0, 1]))
+    assert np.all(
+        (results["site"] >= 0)
+        & (results["site"] < len(survey.observator.default_locations))
+    )
+    assert scheduler.steps_per_second > 0
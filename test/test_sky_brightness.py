@@ -0,0 +1,95 @@
+import pytest
+import numpy as np
+import astropy
+
+from DeepSurveySim.Survey import SkyBrightnessTable, ObservationVariables
+from DeepSurveySim.IO import ReadConfig
+
+
+class ConstantSkyModel:
+    m_zen = {"g": 22.3, "r": 21.5}
+
+    def __call__(self, mjd, ra, decl, band, moon_crds, moon_elongation, sun_crds):
+        assert len(ra) == len(mjd) == len(moon_crds) == len(moon_elongation)
+        return np.full(len(mjd), 21.0 if band == "g" else 20.0)
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    site = astropy.coordinates.EarthLocation.from_geodetic(
+        lon=-70.815 * astropy.units.deg, lat=-30.16527778 * astropy.units.deg
+    )
+    path = str(tmp_path_factory.mktemp("sky_brightness") / "skybright_table.npz")
+    SkyBrightnessTable.build(
+        path, ConstantSkyModel(), site, 2000, 3, 60000, 60030, chunk=1000
+    )
+    return SkyBrightnessTable(path)
+
+
+def test_build_table(table):
+    assert table.bands == ["g", "r"]
+    assert table.grid.shape == (2, 3, 3, 3, 3, 3)
+    assert not np.any(np.isnan(table.grid))
+    assert table.m_zen["g"] == pytest.approx(22.3)
+
+    sky_magnitude = table("r", np.array([0, 45, 89]), 90, -10, 100, -40)
+    assert sky_magnitude.shape == (3,)
+    assert np.allclose(sky_magnitude, 20.0)
+
+
+def test_build_bins_each_feature_on_its_axis(tmp_path):
+    site = astropy.coordinates.EarthLocation.from_geodetic(
+        lon=-70.815 * astropy.units.deg, lat=-30.16527778 * astropy.units.deg
+    )
+
+    class TwilightSkyModel:
+        m_zen = {"g": 22.3}
+
+        def __call__(self, mjd, ra, decl, band, moon_crds, moon_elongation, sun_crds):
+            frame = astropy.coordinates.AltAz(
+                obstime=astropy.time.Time(mjd, format="mjd"), location=site
+            )
+            return 20 + 0.02 * sun_crds.transform_to(frame).alt.deg
+
+    path = str(tmp_path / "skybright_table.npz")
+    SkyBrightnessTable.build(
+        path, TwilightSkyModel(), site, 2000, 5, 60000, 60030, chunk=2000
+    )
+    table = SkyBrightnessTable(path)
+
+    # Nodes are 22.5 degrees apart in sun altitude; only the sun altitude changes the sky
+    sun_alt = np.array([-45, -33.75, -22.5])
+    sky_magnitude = table("g", 30, 90, -20, 100, sun_alt)
+    assert np.allclose(sky_magnitude, 20 + 0.02 * sun_alt, atol=0.1)
+    assert np.allclose(
+        table("g", np.array([10, 50, 80]), 150, 40, 20, -45), sky_magnitude[0], atol=0.1
+    )
+
+
+def test_interpolation_is_multilinear(table):
+    table = SkyBrightnessTable(table.path)
+    nodes = [
+        np.linspace(*SkyBrightnessTable.ranges[name], 3)
+        for name in SkyBrightnessTable.axes
+    ]
+    mesh = np.meshgrid(*nodes, indexing="ij")
+    slopes = [0.01, -0.002, 0.005, 0.003, -0.004]
+    table.grid[0] = 20 + sum(slope * axis for slope, axis in zip(slopes, mesh))
+
+    rng = np.random.default_rng()
+    samples = [rng.uniform(*SkyBrightnessTable.ranges[name], 50) for name in table.axes]
+    expected = 20 + sum(slope * sample for slope, sample in zip(slopes, samples))
+    assert np.allclose(table("g", *samples), expected)
+
+
+def test_table_in_observation_variables(table):
+    config = ReadConfig()()
+    config["use_skybright"] = True
+    config["sky_brightness"] = "table"
+    config["sky_brightness_table"] = {"path": table.path}
+    observatory = ObservationVariables(config)
+    observatory.update(np.array([60000.1, 60000.2]))
+
+    results = observatory.calculate(["sky_magnitude", "tau", "teff"])
+    assert results["sky_magnitude"].shape == (10, 2)
+    assert np.allclose(results["sky_magnitude"], 21.0)
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+
+def run(code):
+    return subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def test_lazy_package_import():
+    loaded = run(
+        "import sys, DeepSurveySim.Survey, DeepSurveySim.IO;"
+        "print([m for m in ('astropy', 'astroplan', 'pandas') if m in sys.modules])"
+    )
+    assert loaded == "[]"
+
+
+def test_lazy_class_import():
+    loaded = run(
+        "import sys; from DeepSurveySim.Survey import Survey; from DeepSurveySim.IO import ReadConfig;"
+        "print('astroplan' in sys.modules, 'pandas' in sys.modules)"
+    )
+    assert loaded == "False False"
+
+
+def test_lazy_engine_import():
+    loaded = run(
+        "import sys; from DeepSurveySim.Survey import ObservationVariables; from DeepSurveySim.IO import ReadConfig;"
+        "ObservationVariables(ReadConfig()());"
+        "print([m for m in ('ephemeris', 'sky_brightness', 'tessellation') if f'DeepSurveySim.Survey.{m}' in sys.modules])"
+    )
+    assert loaded == "[]"
+
+
+def test_offline_iers():
+    table = run(
+        "from DeepSurveySim.Survey import ObservationVariables; from DeepSurveySim.IO import ReadConfig;"
+        "from astropy.utils import iers; iers.conf.auto_download = True;"
+        "config = ReadConfig()(); config['iers'] = 'offline'; ObservationVariables(config).update(60000);"
+        "print(iers.conf.auto_download, iers.conf.iers_degraded_accuracy)"
+    )
+    assert table == "False warn"
@@ -1,3 +1,4 @@
+import json
 import pytest
 import pandas as pd
 import numpy as np
@@ -176,3 +177,200 @@ def test_subset_gather_variables():
             assert observation[key].shape == expected_shape
 
     assert set(observation_keys) == set(expected_subset)
+
+
+def test_moon_angle_invalid():
+    survey_config = ReadConfig(survey=True)()
+    survey_config["constaints"] = {}
+    obs_config = ReadConfig()()
+    obs_config["location"] = {"ra": [0], "decl": [0]}
+
+    s = Survey(survey_config=survey_config, observatory_config=obs_config)
+    s.step({"time": 60000})
+    moon = s.observator._moon_coordinates()
+    observation, reward, _, _ = s.step(
+        {"time": 60000, "location": {"ra": [moon.ra.deg], "decl": [moon.dec.deg]}}
+    )
+
+    assert not np.any(observation["valid"])
+    assert np.all(reward == s.invalid_penality)
+
+
+def test_run_survey_results():
+    survey_config = ReadConfig(survey=True)()
+    survey_config["stopping"] = {"timestep": 4}
+    survey = Survey(survey_config=survey_config, observatory_config=ReadConfig()())
+    n_sites = len(survey.observator.default_locations)
+
+    results = survey()
+
+    assert len(results) == 4
+    for variable in survey.variables + ["valid", "reward"]:
+        assert results[variable].shape == (4, n_sites)
+    assert results["valid"].dtype == np.bool_
+    assert np.all(np.diff(results["mjd"]) > 0)
+    assert np.all(results["reward"][~results["valid"]] == survey.invalid_penality)
+
+
+class PreemptedSurvey(Survey):
+    preempt_at = 5
+
+    def step(self, action):
+        if self.timestep == self.preempt_at:
+            raise KeyboardInterrupt
+        return super().step(action)
+
+
+def test_checkpoint_resume(tmp_path):
+    survey_config = ReadConfig(survey=True)()
+    survey_config["stopping"] = {"timestep": 8}
+    survey_config["start_time"] = 60000.1
+    survey_config["checkpoint"] = {"path": str(tmp_path), "every": 2}
+
+    expected = Survey(survey_config=survey_config, observatory_config=ReadConfig()())()
+
+    preempted = PreemptedSurvey(
+        survey_config=survey_config, observatory_config=ReadConfig()()
+    )
+    with pytest.raises(KeyboardInterrupt):
+        preempted()
+    # The checkpoints after steps 2 and 4 only wrote the new steps
+    with open(f"{tmp_path}/state.json") as f:
+        assert json.load(f)["files"]["results"] == [
+            "results_000000000_000000002.npz",
+            "results_000000002_000000004.npz",
+        ]
+
+    resumed = Survey(survey_config=survey_config, observatory_config=ReadConfig()())
+    results = resumed.resume(str(tmp_path))
+
+    assert len(results) == len(expected) == 8
+    for name in expected.keys():
+        assert np.array_equal(results[name], expected[name], equal_nan=True)
+    assert resumed.timestep == 8
+
+
+def test_resume_preempted_twice(tmp_path):
+    survey_config = ReadConfig(survey=True)()
+    survey_config["stopping"] = {"timestep": 8}
+    survey_config["start_time"] = 60000.1
+    survey_config["checkpoint"] = {"path": str(tmp_path), "every": 2}
+
+    expected = Survey(survey_config=survey_config, observatory_config=ReadConfig()())()
+
+    with pytest.raises(KeyboardInterrupt):
+        PreemptedSurvey(
+            survey_config=survey_config, observatory_config=ReadConfig()()
+        )()
+
+    # The resumed run keeps checkpointing to the directory it resumed from
+    survey_config["checkpoint"] = {"path": None, "every": 2}
+    resumed = PreemptedSurvey(
+        survey_config=survey_config, observatory_config=ReadConfig()()
+    )
+    resumed.preempt_at = 7
+    with pytest.raises(KeyboardInterrupt):
+        resumed.resume(str(tmp_path))
+    with open(f"{tmp_path}/state.json") as f:
+        assert json.load(f)["timestep"] == 6
+
+    results = Survey(
+        survey_config=survey_config, observatory_config=ReadConfig()()
+    ).resume(str(tmp_path))
+
+    assert len(results) == len(expected) == 8
+    for name in expected.keys():
+        assert np.array_equal(results[name], expected[name], equal_nan=True)
+
+
+def test_stop_multiple_conditions_multisite():
+    survey_config = ReadConfig(survey=True)()
+    survey_config["stopping"] = {
+        "timestep": 6,
+        "airmass": {"value": 3.0, "lesser": False},
+        "alt": {"value": 10.0, "lesser": True},
+    }
+    s = Survey(survey_config=survey_config, observatory_config=ReadConfig()())
+
+    observation = {
+        "airmass": np.array([[1.0, 1.5], [2.0, 1.2]]),
+        "alt": np.array([[50.0, 40.0], [30.0, 60.0]]),
+    }
+    assert not s._stop_condition(observation)
+
+    observation["alt"][1, 0] = 5.0
+    assert s._stop_condition(observation)
+
+
+def test_compiled_reward():
+    survey_config = ReadConfig(survey=True)()
+    survey_config["reward"] = {"monitor": "airmass", "min": True, "threshold": 0.6}
+    s = Survey(survey_config=survey_config, observatory_config=ReadConfig()())
+
+    airmass = np.array([[1.0, 1.5, 2.0], [1.2, np.nan, 3.0]], dtype=np.float32)
+    valid = np.array([[True, True, False], [True, True, True]])
+    reward = s._reward({"airmass": airmass, "valid": valid})
+
+    expected = airmass ** (-1)
+    expected = np.where(expected > 0.6, expected, -100)
+    expected = np.where(~valid, -100, expected)
+    assert reward.dtype == np.float32
+    assert np.array_equal(reward, expected)
+
+
+@pytest.mark.parametrize("band", [["g", "g", "r", "z"], None])
+def test_evaluate_actions(band):
+    survey_config = ReadConfig(survey=True)()
+    survey_config["variables"] = ["airmass", "alt", "moon_airmass"]
+    survey_config["start_time"] = 59900.2
+    observatory_config = ReadConfig()()
+    observatory_config["filter_change_rate"] = 120.0
+    s = Survey(survey_config=survey_config, observatory_config=observatory_config)
+    s.reset()
+
+    candidates = {
+        "location": {"ra": [10.0, 40.0, 200.0, 10.0], "decl": [-30.0, -5.0, 20, -30]},
+        "band": band,
+    }
+    state = s._state()
+    observation, reward = s.evaluate_actions(candidates)
+
+    assert s._state() == state
+    assert reward.shape == (4,)
+    for name in survey_config["variables"] + ["valid", "mjd"]:
+        assert observation[name].shape == (4,)
+
+    for index in range(4):
+        s._restore_state(state)
+        expected, expected_reward, _, _ = s.step(
+            {
+                "location": {
+                    "ra": [candidates["location"]["ra"][index]],
+                    "decl": [candidates["location"]["decl"][index]],
+                },
+                "band": None if band is None else band[index],
+            }
+        )
+        assert np.isclose(observation["mjd"][index], expected["mjd"], atol=1e-9)
+        assert observation["valid"][index] == expected["valid"].ravel()[0]
+        assert np.isclose(reward[index], expected_reward.ravel()[0], rtol=1e-5)
+        for name in survey_config["variables"]:
+            assert np.isclose(
+                observation[name][index],
+                expected[name].ravel()[0],
+                rtol=1e-5,
+                equal_nan=True,
+            )
+
+
+def test_reset_pointing_and_band():
+    s = Survey(
+        survey_config=ReadConfig(survey=True)(), observatory_config=ReadConfig()()
+    )
+    s.step({"location": {"ra": [10.0], "decl": [-20.0]}, "band": "z"})
+    s.reset()
+
+    assert s.observator.location is s.observator.default_locations
+    assert s.observator.band == s.initial_band
+    assert s.timestep == 0
+    assert np.array_equal(s.observator.mjd, s.time)
@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+
+from DeepSurveySim.Survey import SkyTessellation, ObservationVariables
+from DeepSurveySim.IO import ReadConfig
+
+
+@pytest.mark.parametrize("nside", [1, 2, 3, 8])
+def test_pixel_count(nside):
+    grid = SkyTessellation(nside)
+
+    assert len(grid) == 12 * nside**2
+    assert grid.unit_vectors.shape == (12 * nside**2, 3)
+    assert np.sum(grid.ring_count) == len(grid)
+    assert grid.area_weights.sum() == pytest.approx(1)
+    assert grid.pixel_area * len(grid) == pytest.approx(41252.96, rel=1e-6)
+
+
+def test_equal_area():
+    grid = SkyTessellation(8)
+
+    # Area between two declinations is proportional to the difference of sin(decl)
+    # so every band cut between rings holds its share of pixels
+    z = np.sin(np.radians(grid.decl))
+    for cut in range(1, grid.n_rings):
+        north = grid.ring <= cut
+        boundary = (z[grid.ring == cut].max() + z[grid.ring == cut + 1].max()) / 2
+        assert north.sum() / len(grid) == pytest.approx((1 - boundary) / 2, abs=0.01)
+
+
+def test_even_coverage():
+    grid = SkyTessellation(8)
+    rng = np.random.default_rng(1)
+    points = rng.normal(size=(20000, 3))
+    points /= np.linalg.norm(points, axis=1)[:, np.newaxis]
+
+    nearest = np.argmax(points @ grid.unit_vectors.T, axis=1)
+    counts = np.bincount(nearest, minlength=len(grid))
+
+    assert counts.mean() == pytest.approx(20000 / len(grid))
+    assert counts.std() < 4 * np.sqrt(counts.mean())
+
+
+def test_neighbours_symmetric_and_close():
+    grid = SkyTessellation(4)
+    resolution = np.sqrt(grid.pixel_area)
+
+    for pixel, neighbours in enumerate(grid.neighbours):
+        neighbours = neighbours[neighbours >= 0]
+        assert len(neighbours) >= 4
+        assert pixel not in neighbours
+        for neighbour in neighbours:
+            assert pixel in grid.neighbours[neighbour]
+
+        separation = np.degrees(
+            np.arccos(
+                np.clip(grid.unit_vectors[neighbours] @ grid.unit_vectors[pixel], -1, 1)
+            )
+        )
+        assert np.all(separation < 2 * resolution)
+
+
+def test_nside_locations():
+    config = ReadConfig(observator_configuration="DeepSurveySim/settings/SEO.yaml")()
+    config["location"] = {"nside": 4}
+    observatory = ObservationVariables(config)
+    observatory.update(60000.2)
+
+    assert len(observatory.default_locations) == 192
+    assert observatory._site_unit_vectors() is observatory.tessellation.unit_vectors
+    assert observatory.calculate(["alt"])["alt"].shape == (192,)
@@ -0,0 +1,165 @@
+import pytest
+import numpy as np
+
+from DeepSurveySim.Survey import Survey, VectorSurvey
+from DeepSurveySim.IO import ReadConfig
+
+
+@pytest.fixture
+def configs():
+    survey_config = ReadConfig(survey=True)()
+    survey_config["start_time"] = 60000.2
+    return ReadConfig()(), survey_config
+
+
+def test_shapes(configs):
+    surveys = VectorSurvey(*configs, n_envs=4)
+    n_sites = len(surveys.observator.default_locations)
+
+    observation, reward, stop, log = surveys.step({})
+    for variable in surveys.variables + ["valid"]:
+        assert observation[variable].shape == (4, n_sites)
+    assert observation["mjd"].shape == (4,)
+    assert reward.shape == (4, n_sites)
+    assert stop.shape == (4,)
+    assert log["reset"].shape == (4,)
+
+    ra = np.linspace(0, 300, 4)
+    action = {"location": {"ra": ra, "decl": np.full(4, -10.0)}, "band": "r"}
+    observation, reward, stop, _ = surveys.step(action)
+    assert observation["airmass"].shape == (4, 1)
+    assert reward.shape == (4, 1)
+    assert np.all(surveys.timestep == 2)
+
+
+def test_matches_survey(configs):
+    survey = Survey(*configs)
+    surveys = VectorSurvey(*configs, n_envs=3)
+
+    n_sites = len(survey.observator.default_locations)
+    actions = [
+        {"band": "g"},
+        {
+            "location": {
+                "ra": np.linspace(10, 300, n_sites),
+                "decl": np.linspace(-60, 20, n_sites),
+            },
+            "band": "r",
+        },
+        {
+            "location": {
+                "ra": np.linspace(80, 120, n_sites),
+                "decl": np.linspace(-40, -30, n_sites),
+            },
+            "band": "r",
+        },
+    ]
+    for action in actions:
+        vector_action = {"time": survey.time, **action}
+        if "location" in action:
+            vector_action["location"] = {
+                name: np.asarray(value)[np.newaxis]
+                for name, value in action["location"].items()
+            }
+        observation, reward, _, _ = survey.step({"time": survey.time, **action})
+        vector_observation, vector_reward, _, _ = surveys.step(vector_action)
+
+        if np.ndim(reward) == 2:
+            # Survey observes every site at every site's time, VectorSurvey each site at its own time
+            observation = {
+                name: np.diagonal(value) if np.ndim(value) == 2 else value
+                for name, value in observation.items()
+            }
+            reward = np.diagonal(reward)
+
+        for variable in surveys.variables + ["valid"]:
+            for member in range(3):
+                assert vector_observation[variable][member] == pytest.approx(
+                    observation[variable], nan_ok=True
+                )
+        assert np.allclose(
+            vector_observation["mjd"], observation["mjd"], rtol=0, atol=1e-9
+        )
+        assert vector_reward[0] == pytest.approx(reward)
+
+
+def test_mixed_bands(configs):
+    surveys = VectorSurvey(*configs, n_envs=2)
+    observation, _, _, _ = surveys.step({"band": ["g", "z"]})
+    assert list(surveys.band) == ["g", "z"]
+    assert np.all(observation["mjd"] > 60000.2)
+
+
+def test_members_share_default_sites(configs):
+    survey = Survey(*configs)
+    surveys = VectorSurvey(*configs, n_envs=4)
+    default = survey.observator.default_locations
+    location = {"ra": default.ra.deg, "decl": default.dec.deg}
+
+    survey.step({"location": location, "band": "r"})
+    surveys.step(
+        {
+            "location": {name: value[np.newaxis] for name, value in location.items()},
+            "band": "r",
+        }
+    )
+
+    # Every member reaches every site at the time Survey.step does, so the sites and times are calculated once
+    assert surveys.observator.mjd.size == 1
+    assert surveys.observator.mjd[0] == survey.observator.mjd
+    assert len(surveys.observator.location) == len(default)
+
+
+def test_reset_on_stop(configs):
+    observatory_config, survey_config = configs
+    survey_config["stopping"] = {"timestep": 2}
+    surveys = VectorSurvey(observatory_config, survey_config, n_envs=3)
+    location = {"ra": [10.0, 20.0, 30.0], "decl": [0.0, 0.0, 0.0]}
+
+    _, _, stop, log = surveys.step({"location": location, "band": "g"})
+    assert not np.any(stop)
+    _, _, stop, log = surveys.step({"location": location, "band": "g"})
+    assert np.all(stop) and np.all(log["reset"])
+
+    assert np.all(surveys.timestep == 0)
+    assert np.all(surveys.time == 60000.2)
+    assert surveys.ra.shape == (3, len(surveys.observator.default_locations))
+
+
+def test_reset_only_stopped_members(configs):
+    observatory_config, survey_config = configs
+    survey_config["stopping"] = {"timestep": 6}
+    surveys = VectorSurvey(observatory_config, survey_config, n_envs=3)
+    n_sites = len(surveys.observator.default_locations)
+    surveys.timestep = np.array([0, 5, 5])
+
+    location = {"ra": [10.0, 20.0, 30.0], "decl": [0.0, -10.0, -20.0]}
+    _, _, stop, _ = surveys.step({"location": location, "band": "g"})
+    assert list(stop) == [False, True, True]
+
+    assert surveys.ra.shape == (3, n_sites)
+    assert surveys.ra[0, 0] == pytest.approx(10.0, abs=1)
+    assert list(surveys.site_mask.sum(axis=1)) == [1, n_sites, n_sites]
+    assert np.array_equal(surveys.ra[1], surveys.observator.default_locations.ra.deg)
+    time = surveys.time[0]
+
+    # Staying put, member 0 observes its one site without a slew
+    observation, reward, _, _ = surveys.step({})
+    assert observation["mjd"][0] == pytest.approx(time, abs=1e-9)
+    assert np.isfinite(observation["alt"][0, 0])
+    assert np.all(np.isnan(observation["alt"][0, 1:]))
+    assert not np.any(observation["valid"][0, 1:])
+    assert np.all(np.isnan(reward[0, 1:]))
+    assert list(surveys.timestep) == [2, 1, 1]
+
+
+def test_call(configs):
+    observatory_config, survey_config = configs
+    survey_config["stopping"] = {"timestep": 3}
+    surveys = VectorSurvey(observatory_config, survey_config, n_envs=2)
+    surveys.timestep = np.array([0, 1])
+
+    results = surveys()
+    assert [len(result) for result in results] == [3, 2]
+    n_sites = len(surveys.observator.default_locations)
+    assert results[0]["airmass"].shape == (3, n_sites)
@@ -85,3 +85,14 @@ def test_update_clouds_bad_conditions(obsprog):
     obsprog.update(time=58119)
 
     assert obsprog.clouds != original_clouds
+
+
+def test_weather_array_matches_scalar(weather):
+    mjd = np.array([58119, 58300, 58320, 58500.5])
+    seeing, clouds = weather(mjd)
+
+    assert seeing.shape == mjd.shape
+    for index, time in enumerate(mjd):
+        condition = weather.condition(time)
+        assert seeing[index] == weather.seeing(condition)
+        assert clouds[index] == weather.clouds(condition)